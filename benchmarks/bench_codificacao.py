@@ -0,0 +1,114 @@
+"""Compara os perfis de codificação: tamanho do .docx contra a qualidade das imagens.
+
+Uso: python benchmarks/bench_codificacao.py [pasta_com_fotos] [--quantidade 20]
+
+Sem pasta, usa fotos sintéticas de 4000x3000 + uma placa (JPEG) + uma placa PNG com
+transparência. Para cada perfil mostra os bytes das imagens, o tamanho e o tempo de
+gravação do .docx e o PSNR médio em relação à imagem reduzida sem perdas (quanto
+maior, mais fiel; acima de ~35 dB a diferença é difícil de ver no tamanho 5x4 cm).
+"""
+import argparse
+import glob
+import io
+import math
+import os
+import sys
+import time
+from datetime import date
+
+from PIL import Image, ImageChops, ImageStat
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import gerar_fotos, gerar_placa  # noqa: E402
+from processamento_imagens import (  # noqa: E402
+    MODO_DECODIFICACAO_PADRAO, PERFIS_CODIFICACAO, _achatar_transparencia, reduzir_imagem
+)
+from relatorio import gerar_relatorio  # noqa: E402
+
+
+def carregar_fotos(pasta):
+    caminhos = sorted(p for p in glob.glob(os.path.join(pasta, "*")) if p.lower().endswith((".jpg", ".jpeg", ".png")))
+    fotos = []
+    for caminho in caminhos:
+        with open(caminho, "rb") as arquivo:
+            fotos.append(arquivo.read())
+    return fotos
+
+
+def referencia(original, tamanho):
+    """Foto reduzida pelo mesmo caminho do relatório, mas ainda sem codificar (sem perdas)"""
+    with Image.open(io.BytesIO(original)) as img:
+        if MODO_DECODIFICACAO_PADRAO == "rapido":
+            img.draft("RGB", tamanho)
+        img.load()
+        return _achatar_transparencia(img).convert("RGB").resize(tamanho, Image.LANCZOS)
+
+
+def psnr(original, reduzida):
+    """PSNR (dB) entre a foto reduzida sem perdas e a versão codificada"""
+    with Image.open(io.BytesIO(reduzida)) as img:
+        img = img.convert("RGB")
+    ref = referencia(original, img.size)
+    erro_quadratico = sum(ImageStat.Stat(ImageChops.difference(ref, img)).sum2) / (img.width * img.height * 3)
+    if erro_quadratico == 0:
+        return float("inf")
+    return 10 * math.log10(255 ** 2 / erro_quadratico)
+
+
+def medir_perfil(fotos, placas, perfil):
+    todas = fotos + placas
+    inicio = time.perf_counter()
+    reduzidas = [reduzir_imagem(io.BytesIO(f), 5, 4, perfil=perfil).getvalue() for f in todas]
+    codificacao = time.perf_counter() - inicio
+    qualidade = sum(psnr(f, r) for f, r in zip(todas, reduzidas)) / len(todas)
+
+    inicio = time.perf_counter()
+    docx = gerar_relatorio("BENCH", date.today(), "", fotos, placas[1:], placas[0] if placas else None,
+                           workers=1, perfil=perfil, perfil_placa=perfil)
+    geracao = time.perf_counter() - inicio
+    return {
+        'bytes_imagens': sum(len(r) for r in reduzidas),
+        'bytes_docx': len(docx),
+        'reducao_s': codificacao,
+        'relatorio_s': geracao,
+        'psnr_db': qualidade,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tamanho x qualidade dos perfis de codificação")
+    parser.add_argument("pasta", nargs="?", help="pasta com fotos .jpg/.png (padrão: fotos sintéticas)")
+    parser.add_argument("--quantidade", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.pasta:
+        fotos, placas = carregar_fotos(args.pasta)[:args.quantidade], []
+    else:
+        fotos = gerar_fotos(args.quantidade, unicas=True)
+        placas = [gerar_placa(), gerar_placa(transparente=True)]
+    if not fotos:
+        print("Nenhuma foto encontrada")
+        return 1
+    print(f"{len(fotos)} fotos + {len(placas)} placas\n")
+    print(f"{'perfil':10} {'imagens':>10} {'docx':>10} {'redução':>9} {'relatório':>10} {'PSNR':>8}")
+    # Como era antes dos perfis: JPEG com as opções padrão do Pillow
+    sem_perfil = 0
+    for foto in fotos + placas:
+        with Image.open(io.BytesIO(reduzir_imagem(io.BytesIO(foto), 5, 4).getvalue())) as img:
+            buffer = io.BytesIO()
+            referencia(foto, img.size).save(buffer, format="JPEG")
+            sem_perfil += buffer.tell()
+    print(f"{'sem perfil':10} {sem_perfil / 1024:8.0f}KB")
+    base = None
+    for perfil in PERFIS_CODIFICACAO:
+        r = medir_perfil(fotos, placas, perfil)
+        base = base or r['bytes_docx']
+        print(f"{perfil:10} {r['bytes_imagens'] / 1024:8.0f}KB {r['bytes_docx'] / 1024:8.0f}KB "
+              f"{r['reducao_s']:8.2f}s {r['relatorio_s']:9.2f}s {r['psnr_db']:6.1f}dB  "
+              f"({r['bytes_docx'] / base - 1:+.0%} vs padrao)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
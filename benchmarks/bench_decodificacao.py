@@ -0,0 +1,59 @@
+"""Compara a decodificação completa com o modo rápido (draft/escala DCT) do JPEG.
+
+Uso: python benchmarks/bench_decodificacao.py [pasta_com_fotos]
+
+Sem pasta, usa fotos sintéticas de 4000x3000. Além do tempo, mostra o tamanho
+do bitmap decodificado por foto, que é o que domina o pico de memória.
+"""
+import glob
+import io
+import os
+import sys
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processamento_imagens import pixels_alvo, reduzir_imagem  # noqa: E402
+from fixtures import gerar_fotos  # noqa: E402
+
+
+def carregar_fotos(pasta):
+    caminhos = sorted(glob.glob(os.path.join(pasta, "*.jp*g")) + glob.glob(os.path.join(pasta, "*.JP*G")))
+    fotos = []
+    for caminho in caminhos:
+        with open(caminho, "rb") as arquivo:
+            fotos.append(arquivo.read())
+    return fotos
+
+
+def bitmap_decodificado_mb(foto, modo):
+    with Image.open(io.BytesIO(foto)) as img:
+        if modo == "rapido":
+            img.draft("RGB", pixels_alvo(5, 4))
+        largura, altura = img.size
+        return largura * altura * len(img.getbands()) / 1024 / 1024
+
+
+def main():
+    fotos = carregar_fotos(sys.argv[1]) if len(sys.argv) > 1 else gerar_fotos(10)
+    if not fotos:
+        print("Nenhuma foto JPEG encontrada")
+        return
+    print(f"{len(fotos)} fotos")
+    tempos = {}
+    for modo in ("completo", "rapido"):
+        inicio = time.perf_counter()
+        cpu_inicio = time.process_time()
+        for foto in fotos:
+            reduzir_imagem(io.BytesIO(foto), 5, 4, modo_decodificacao=modo)
+        tempos[modo] = time.perf_counter() - inicio
+        cpu = time.process_time() - cpu_inicio
+        bitmap = max(bitmap_decodificado_mb(foto, modo) for foto in fotos)
+        print(f"{modo:9} parede {tempos[modo]:6.2f} s  CPU {cpu:6.2f} s  bitmap por foto {bitmap:6.1f} MB")
+    print(f"Ganho de tempo: {tempos['completo'] / tempos['rapido']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
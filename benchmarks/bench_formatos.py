@@ -0,0 +1,59 @@
+"""Custo de gerar o relatório em .docx, em PDF e nos dois formatos.
+
+Uso: python benchmarks/bench_formatos.py [--fotos 30] [--repeticoes 3]
+
+Compara os dois formatos gerados juntos (fotos reduzidas uma vez, mesmos bytes
+JPEG no .docx e no PDF) com duas gerações separadas, que decodificam e
+redimensionam cada foto duas vezes. O cache de imagens fica desligado para que
+a segunda geração não se aproveite da primeira.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RELATORIO_CACHE_MB", "0")
+os.environ.setdefault("RELATORIO_POOL_COMPARTILHADO_WORKERS", "0")
+
+from fixtures import gerar_fotos  # noqa: E402
+from relatorio import gerar_relatorio, gerar_relatorios  # noqa: E402
+
+
+def medir(funcao, repeticoes):
+    melhor, resultado = None, None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor, resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Relatório em .docx, PDF e nos dois formatos")
+    parser.add_argument("--fotos", type=int, default=30, help="fotos em ANTES e em DEPOIS")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"gerando {2 * args.fotos + 1} fotos 4000x3000...", flush=True)
+    fotos = gerar_fotos(2 * args.fotos + 1, unicas=True)
+    site = ("BENCH", date.today(), "São Paulo - SP", fotos[:args.fotos], fotos[args.fotos:-1], fotos[-1])
+
+    casos = {
+        "só .docx": lambda: {"docx": gerar_relatorio(*site)},
+        "só PDF": lambda: {"pdf": gerar_relatorio(*site, formato="pdf")},
+        "os dois, separados": lambda: {formato: gerar_relatorio(*site, formato=formato) for formato in ("docx", "pdf")},
+        "os dois, juntos": lambda: gerar_relatorios(*site, formatos=("docx", "pdf")),
+    }
+    print(f"\n{'caso':20} {'tempo':>9} {'tamanho':>22}")
+    for nome, funcao in casos.items():
+        tempo, arquivos = medir(funcao, args.repeticoes)
+        tamanhos = ", ".join(f"{formato} {len(dados) / 1024:.0f} KiB" for formato, dados in arquivos.items())
+        print(f"{nome:20} {tempo:7.2f} s   {tamanhos}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
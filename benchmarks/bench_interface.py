@@ -0,0 +1,116 @@
+"""Custo de cada interação no app: página inteira x só o fragmento que mudou.
+
+Uso: python benchmarks/bench_interface.py [--fotos 40] [--repeticoes 10] [--script app.py]
+
+Monta uma sessão com as fotos enviadas (miniaturas na tela) e mede, em tempo
+de relógio e de CPU do processo, a reexecução da página inteira (o que toda
+interação custava antes dos fragmentos) e a de cada seção isolada (o que custa
+paginar as miniaturas, digitar no formulário ou abrir os tempos no painel).
+Mostra também a importação a frio dos módulos do app e se PIL/docx já foram
+carregados antes do primeiro relatório.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from datetime import date
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+# Sem pool de processos: a medição é da interface, não do trabalho de imagem
+os.environ.setdefault("RELATORIO_POOL_COMPARTILHADO_WORKERS", "0")
+
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache  # noqa: E402
+from streamlit.testing.v1 import AppTest, local_script_runner  # noqa: E402
+
+from fixtures import gerar_foto  # noqa: E402
+from processamento_imagens import gerar_miniatura  # noqa: E402
+
+
+# O servidor compila o script uma vez; o AppTest recompila a cada execução. Um cache
+# único deixa a medição com o custo de execução que o servidor tem de verdade.
+_cache_scripts = ScriptCache()
+local_script_runner.ScriptCache = lambda: _cache_scripts
+
+
+def _secao(nome, args):
+    import interface
+
+    getattr(interface, nome)(*args)
+
+
+SECOES = {
+    'paginar miniaturas': ('secao_fotos', ('fotos_antes_data', "🔴 Fotos ANTES", "Antes", "ANTES")),
+    'digitar no formulário': ('secao_formulario', ()),
+    'abrir tempos no painel': ('painel_lateral', ()),
+}
+
+
+def preparar_sessao(app, quantidade):
+    foto = gerar_foto(800, 600)
+    registro = {'name': 'foto.jpg', 'size': len(foto), 'type': 'image/jpeg', 'data': foto,
+                'thumb': gerar_miniatura(foto), 'hash': 'bench'}
+    app.session_state['rascunho_token'] = 'bench'
+    app.session_state['site_id'] = 'BENCH'
+    app.session_state['localizacao'] = 'São Paulo - SP'
+    app.session_state['data_execucao'] = date(2026, 1, 2)
+    for chave, total in (('fotos_depois_data', quantidade), ('foto_placa_data', 1)):
+        app.session_state[chave] = {f"{chave}{i}": dict(registro) for i in range(total)}
+        app.session_state[f"rascunho_{chave}"] = set(app.session_state[chave])
+    app.session_state['rascunho_campos'] = ('BENCH', date(2026, 1, 2), 'São Paulo - SP')
+    return app
+
+
+def enviar_fotos(app, quantidade):
+    """Fotos do ANTES pelo próprio upload, para que as miniaturas apareçam como no uso real"""
+    uploads = [u for u in app.file_uploader if u.key == "upload_antes"]
+    if uploads:
+        foto = gerar_foto(800, 600)
+        uploads[0].set_value([(f"foto{i}.jpg", foto, "image/jpeg") for i in range(quantidade)]).run()
+
+
+def medir(app, repeticoes, quantidade):
+    app.run()
+    enviar_fotos(app, quantidade)
+    inicio, cpu = time.perf_counter(), time.process_time()
+    for _ in range(repeticoes):
+        app.run()
+    return (time.perf_counter() - inicio) / repeticoes, (time.process_time() - cpu) / repeticoes
+
+
+def importacao_a_frio(modulos):
+    codigo = (
+        "import sys, time, streamlit; t = time.perf_counter(); "
+        f"[__import__(m) for m in {modulos!r}]; "
+        "print(round((time.perf_counter() - t) * 1000), 'PIL' in sys.modules, 'docx' in sys.modules)"
+    )
+    saida = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, capture_output=True, text=True).stdout.split()
+    return int(saida[0]), saida[1] == "True", saida[2] == "True"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reexecução da página inteira x por fragmento")
+    parser.add_argument("--fotos", type=int, default=40, help="fotos em ANTES e em DEPOIS")
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--script", default=os.path.join(RAIZ, "app.py"))
+    args = parser.parse_args(argv)
+
+    app = preparar_sessao(AppTest.from_file(os.path.abspath(args.script), default_timeout=60), args.fotos)
+    pagina, pagina_cpu = medir(app, args.repeticoes, args.fotos)
+    print(f"{2 * args.fotos + 1} fotos na sessão\n")
+    print(f"{'interação':24} {'página inteira':>15} {'só a seção':>12} {'CPU página':>11} {'CPU seção':>10}")
+    for interacao, (nome, secao_args) in SECOES.items():
+        app = AppTest.from_function(_secao, args=(nome, secao_args), default_timeout=60)
+        secao, secao_cpu = medir(preparar_sessao(app, args.fotos), args.repeticoes, args.fotos)
+        print(f"{interacao:24} {pagina * 1000:12.0f} ms {secao * 1000:9.0f} ms "
+              f"{pagina_cpu * 1000:8.0f} ms {secao_cpu * 1000:7.0f} ms  ({pagina / secao:4.1f}x)")
+
+    tempo, pil, docx = importacao_a_frio(["interface"])
+    print(f"\nImportação a frio dos módulos do app (além do streamlit): {tempo} ms "
+          f"(PIL carregado: {pil}, docx carregado: {docx})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
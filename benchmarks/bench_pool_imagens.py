@@ -0,0 +1,37 @@
+"""Compara a redução serial das fotos com o pool de processamento paralelo.
+
+Uso: python benchmarks/bench_pool_imagens.py [quantidade] [workers]
+"""
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processamento_imagens import reduzir_imagem, reduzir_imagens_em_paralelo  # noqa: E402
+from fixtures import gerar_fotos  # noqa: E402
+
+
+def medir(funcao):
+    inicio = time.perf_counter()
+    funcao()
+    return time.perf_counter() - inicio
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    print(f"Gerando {quantidade} fotos 4000x3000...")
+    fotos = gerar_fotos(quantidade, unicas=True)
+
+    serial = medir(lambda: [reduzir_imagem(io.BytesIO(f), 5, 4) for f in fotos])
+    print(f"Serial:            {serial:7.2f} s")
+    for tipo in ("thread", "process"):
+        paralelo = medir(lambda: reduzir_imagens_em_paralelo(fotos, 5, 4, workers=workers, tipo_pool=tipo,
+                                                                 cache=False))
+        print(f"Pool {tipo:8} ({workers:2}): {paralelo:7.2f} s  ({serial / paralelo:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Custo do controle de qualidade no upload, comparado com a compactação da foto.
+
+Uso: python benchmarks/bench_qualidade.py [--fotos 10] [--largura 4000] [--altura 3000]
+
+A avaliação roda numa prévia de 512 px decodificada pelo draft do JPEG; a
+compactação decodifica a foto inteira, reduz e recodifica. Uma foto recusada
+com RELATORIO_QUALIDADE=descartar só paga a avaliação.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import gerar_fotos  # noqa: E402
+from processamento_imagens import compactar_foto  # noqa: E402
+from qualidade_fotos import avaliar_foto, problemas_foto  # noqa: E402
+
+
+def medir(funcao, fotos):
+    inicio = time.perf_counter()
+    for dados in fotos:
+        funcao(dados)
+    return (time.perf_counter() - inicio) / len(fotos)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Avaliação de qualidade x compactação por foto")
+    parser.add_argument("--fotos", type=int, default=10)
+    parser.add_argument("--largura", type=int, default=4000)
+    parser.add_argument("--altura", type=int, default=3000)
+    args = parser.parse_args(argv)
+
+    print(f"gerando {args.fotos} fotos {args.largura}x{args.altura}...", flush=True)
+    fotos = gerar_fotos(args.fotos, args.largura, args.altura, unicas=True)
+
+    avaliacao = medir(lambda dados: problemas_foto(avaliar_foto(dados)), fotos)
+    compactacao = medir(compactar_foto, fotos)
+    print(f"\n{'etapa':14} {'por foto':>10}")
+    print(f"{'avaliação':14} {avaliacao * 1000:8.1f} ms")
+    print(f"{'compactação':14} {compactacao * 1000:8.1f} ms")
+    print(f"a avaliação custa {avaliacao / compactacao:.0%} da compactação")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Compara o LANCZOS foto a foto do Pillow com a redução em lote do NumPy.
+
+Uso: python benchmarks/bench_redimensionamento_lote.py [--quantidades 20,50,100,200] [--workers N]
+
+As fotos (4000x3000, todas do mesmo tamanho, como as de um mesmo celular) ficam
+em cache numa pasta temporária. Para cada modo de decodificação mostra o tempo
+total da redução e o tempo só da etapa de redimensionamento.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metricas import coletar_relatorio  # noqa: E402
+from processamento_imagens import reduzir_imagens_em_paralelo  # noqa: E402
+from suite import preparar_fixtures  # noqa: E402
+
+
+def medir(fotos, motor, modo, workers):
+    with coletar_relatorio() as coletor:
+        inicio = time.perf_counter()
+        reduzir_imagens_em_paralelo(fotos, 5, 4, workers=workers, modo_decodificacao=modo, cache=False, motor=motor)
+        total = time.perf_counter() - inicio
+    return total, coletor['tempos'].get('redimensionamento', 0.0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Redução foto a foto (Pillow) x em lote (NumPy)")
+    parser.add_argument("--quantidades", default="20,50,100,200")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--pasta-fixtures", default=os.path.join(tempfile.gettempdir(), "relatorio_bench_fixtures"))
+    args = parser.parse_args(argv)
+
+    quantidades = [int(q) for q in args.quantidades.split(",")]
+    caminhos = preparar_fixtures(args.pasta_fixtures, "jpeg_4000x3000", max(quantidades))
+    todas = []
+    for caminho in caminhos:
+        with open(caminho, "rb") as arquivo:
+            todas.append(arquivo.read())
+
+    print(f"{'modo':9} {'fotos':>5} {'pil total':>10} {'numpy total':>12} {'pil resize':>11} {'numpy resize':>13}")
+    for modo in ("rapido", "completo"):
+        for quantidade in quantidades:
+            fotos = todas[:quantidade]
+            pil, pil_resize = medir(fotos, "pil", modo, args.workers)
+            numpy, numpy_resize = medir(fotos, "numpy", modo, args.workers)
+            print(f"{modo:9} {quantidade:5d} {pil:9.2f}s {numpy:11.2f}s {pil_resize:10.2f}s {numpy_resize:12.2f}s"
+                  f"  ({pil / numpy:4.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
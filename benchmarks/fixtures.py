@@ -0,0 +1,82 @@
+"""Geração de fotos sintéticas para os benchmarks"""
+import io
+import random
+
+from PIL import Image, ImageDraw, ImageFilter
+from PIL.TiffImagePlugin import IFDRational
+
+# Tags EXIF da densidade: XResolution, YResolution e ResolutionUnit (2 = polegadas)
+_EXIF_XRESOLUTION, _EXIF_YRESOLUTION, _EXIF_UNIDADE = 282, 283, 296
+
+
+def _opcoes_gravacao(formato, dpi):
+    """Opções do save; o DPI vai no EXIF, como os celulares gravam (não na densidade do JFIF)"""
+    opcoes = {"quality": 90} if formato == "JPEG" else {"compress_level": 1}
+    if dpi:
+        exif = Image.Exif()
+        exif[_EXIF_XRESOLUTION] = exif[_EXIF_YRESOLUTION] = IFDRational(dpi)
+        exif[_EXIF_UNIDADE] = 2
+        opcoes["exif"] = exif
+    return opcoes
+
+
+def gerar_foto(largura=4000, altura=3000, formato="JPEG", dpi=None, semente=0):
+    """Gera uma foto sintética com textura parecida com foto de celular"""
+    rnd = random.Random(semente)
+    base = Image.effect_noise((largura // 8, altura // 8), 64).convert("RGB")
+    base = base.resize((largura, altura), Image.BILINEAR)
+    desenho = ImageDraw.Draw(base)
+    for _ in range(40):
+        x0, y0 = rnd.randrange(largura), rnd.randrange(altura)
+        x1, y1 = x0 + rnd.randrange(50, largura // 3), y0 + rnd.randrange(50, altura // 3)
+        cor = tuple(rnd.randrange(256) for _ in range(3))
+        desenho.rectangle((x0, y0, x1, y1), fill=cor)
+    base = base.filter(ImageFilter.GaussianBlur(2))
+    buffer = io.BytesIO()
+    base.save(buffer, format=formato, **_opcoes_gravacao(formato, dpi))
+    return buffer.getvalue()
+
+
+def gerar_fotos(quantidade, largura=4000, altura=3000, formato="JPEG", dpi=None, unicas=False):
+    """Gera `quantidade` fotos reaproveitando algumas variações para poupar tempo.
+
+    Com `unicas=True` cada foto recebe uma marca própria, para que nenhuma seja
+    deduplicada ou encontrada em cache pelo pipeline.
+    """
+    variacoes = [gerar_foto(largura, altura, formato, dpi, semente=i) for i in range(min(quantidade, 4))]
+    if not unicas:
+        return [variacoes[i % len(variacoes)] for i in range(quantidade)]
+    fotos = []
+    for i in range(quantidade):
+        with Image.open(io.BytesIO(variacoes[i % len(variacoes)])) as img:
+            img = img.convert("RGB")
+        desenho = ImageDraw.Draw(img)
+        lado = max(largura, altura) // 6
+        desenho.rectangle((0, 0, lado, lado), fill=((i * 37) % 256, (i * 91) % 256, (i * 13) % 256))
+        buffer = io.BytesIO()
+        img.save(buffer, format=formato, **_opcoes_gravacao(formato, dpi))
+        fotos.append(buffer.getvalue())
+    return fotos
+
+
+def gerar_placa(largura=2000, altura=1500, texto="SITE SP-0001", transparente=False):
+    """Gera uma foto sintética de placa de identificação: fundo chapado, faixa e texto.
+
+    Com `transparente=True` retorna PNG RGBA (com cantos transparentes), como alguns
+    aplicativos de digitalização exportam.
+    """
+    modo = "RGBA" if transparente else "RGB"
+    img = Image.new(modo, (largura, altura), (0, 0, 0, 0) if transparente else (200, 200, 200))
+    desenho = ImageDraw.Draw(img)
+    margem = largura // 20
+    desenho.rectangle((margem, margem, largura - margem, altura - margem), fill=(20, 90, 40, 255))
+    desenho.rectangle((margem, altura // 3, largura - margem, altura // 3 + altura // 10), fill=(250, 250, 250, 255))
+    for i, linha in enumerate((texto, "ZELADORIA", "NAO ENTRE")):
+        desenho.text((margem * 2, altura // 2 + i * altura // 10), linha, fill=(255, 255, 0, 255),
+                     font_size=altura // 12)
+    buffer = io.BytesIO()
+    if transparente:
+        img.save(buffer, format="PNG", compress_level=1)
+    else:
+        img.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
@@ -0,0 +1,215 @@
+"""Benchmark reproduzível do caminho crítico da geração do relatório.
+
+Mede, para cada tipo de foto e quantidade, as etapas:
+    reduzir_imagem         redução serial, foto a foto
+    reduzir_paralelo       redução no pool (sem cache)
+    montagem_modelo        .docx inteiro a partir do modelo preparado, com as imagens já reduzidas
+
+Cada caso roda num processo separado e o pico de RSS é medido por etapa.
+
+Uso:
+    python benchmarks/suite.py [--quantidades 1,10,50,200] [--saida resultados.json]
+                               [--comparar anterior.json] [--limiar 0.2]
+
+Com --comparar, sai com código 1 se alguma etapa ficar mais lenta que o limiar.
+Um caso cujo processo morre ou passa de --timeout-caso segundos é registrado como
+falha (com "falha" no JSON) e também faz a suíte sair com código 1.
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+DIRETORIO_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIRETORIO_RAIZ)
+
+from fixtures import gerar_fotos  # noqa: E402
+
+# nome -> (largura, altura, formato, dpi gravado no EXIF)
+TIPOS_FOTO = {
+    "jpeg_4000x3000": (4000, 3000, "JPEG", None),
+    "jpeg_4000x3000_exif72": (4000, 3000, "JPEG", 72),
+    "png_2000x1500": (2000, 1500, "PNG", None),
+}
+
+
+def preparar_fixtures(pasta, tipo, quantidade):
+    """Gera (ou reaproveita) as fotos do tipo em disco e retorna os caminhos"""
+    largura, altura, formato, dpi = TIPOS_FOTO[tipo]
+    pasta_tipo = os.path.join(pasta, tipo)
+    os.makedirs(pasta_tipo, exist_ok=True)
+    extensao = "jpg" if formato == "JPEG" else "png"
+    caminhos = [os.path.join(pasta_tipo, f"{i:04d}.{extensao}") for i in range(quantidade)]
+    if not all(os.path.exists(c) for c in caminhos):
+        print(f"  gerando {quantidade} fotos {tipo}...", flush=True)
+        for caminho, dados in zip(caminhos, gerar_fotos(quantidade, largura, altura, formato, dpi, unicas=True)):
+            with open(caminho, "wb") as arquivo:
+                arquivo.write(dados)
+    return caminhos
+
+
+def _zerar_pico_rss():
+    # No Linux, escrever "5" em clear_refs zera o VmHWM, permitindo medir o pico de cada etapa
+    try:
+        with open("/proc/self/clear_refs", "w") as arquivo:
+            arquivo.write("5")
+    except OSError:
+        pass
+
+
+def _pico_rss_mb():
+    try:
+        with open("/proc/self/status") as arquivo:
+            for linha in arquivo:
+                if linha.startswith("VmHWM:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    # Fora do Linux, o máximo do processo inteiro (inclui etapas anteriores)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _medir(etapas, nome, funcao):
+    _zerar_pico_rss()
+    inicio = time.perf_counter()
+    cpu_inicio = time.process_time()
+    resultado = funcao()
+    etapas[nome] = {
+        "parede_s": round(time.perf_counter() - inicio, 4),
+        "cpu_s": round(time.process_time() - cpu_inicio, 4),
+        "pico_rss_mb": round(_pico_rss_mb(), 1),
+    }
+    return resultado
+
+
+def _executar_caso(caminhos, fila):
+    from datetime import date
+
+    from docx_streaming import escrever_relatorio_streaming
+    from layout import layout_padrao
+    from modelo_docx import carregar_modelo
+    from processamento_imagens import reduzir_imagem, reduzir_imagens_em_paralelo
+
+    fotos = []
+    for caminho in caminhos:
+        with open(caminho, "rb") as arquivo:
+            fotos.append(arquivo.read())
+
+    etapas = {}
+    largura_cm, altura_cm = layout_padrao.moldura_cm
+    _medir(etapas, "reduzir_imagem",
+           lambda: [reduzir_imagem(io.BytesIO(f), largura_cm, altura_cm, encaixe=True) for f in fotos])
+    reduzidas = _medir(etapas, "reduzir_paralelo",
+                       lambda: reduzir_imagens_em_paralelo(fotos, largura_cm, altura_cm, cache=False, encaixe=True))
+    # O modelo é preparado uma vez por processo; a etapa mede só o custo por relatório
+    carregar_modelo()
+    saida = io.BytesIO()
+    _medir(etapas, "montagem_modelo",
+           lambda: escrever_relatorio_streaming(saida, "BENCH", date.today(), "", blocos=[("FOTOS", fotos, reduzidas)]))
+    etapas["montagem_modelo"]["bytes"] = saida.tell()
+    fila.put(etapas)
+
+
+def _aguardar_caso(processo, fila, timeout_s):
+    """Resultado do caso, ou (None, motivo) se o processo morrer ou passar do tempo"""
+    limite = time.monotonic() + timeout_s
+    while True:
+        try:
+            return fila.get(timeout=1), None
+        except queue.Empty:
+            pass
+        if not processo.is_alive():
+            # O resultado pode ter chegado na fila logo antes de o processo sair
+            try:
+                return fila.get(timeout=1), None
+            except queue.Empty:
+                return None, f"processo saiu com código {processo.exitcode}"
+        if time.monotonic() > limite:
+            processo.terminate()
+            return None, f"passou de {timeout_s:.0f} s"
+
+
+def executar(quantidades, pasta_fixtures, timeout_s):
+    contexto = multiprocessing.get_context("spawn")
+    casos = []
+    for tipo in TIPOS_FOTO:
+        todos = preparar_fixtures(pasta_fixtures, tipo, max(quantidades))
+        for quantidade in quantidades:
+            fila = contexto.Queue()
+            processo = contexto.Process(target=_executar_caso, args=(todos[:quantidade], fila))
+            processo.start()
+            etapas, falha = _aguardar_caso(processo, fila, timeout_s)
+            processo.join()
+            if falha:
+                casos.append({"tipo": tipo, "quantidade": quantidade, "etapas": {}, "falha": falha})
+                print(f"{tipo:22} {quantidade:4d} fotos  FALHOU: {falha}", flush=True)
+                continue
+            casos.append({"tipo": tipo, "quantidade": quantidade, "etapas": etapas})
+            resumo = "  ".join(f"{nome} {e['parede_s']:.2f}s/{e['pico_rss_mb']:.0f}MB" for nome, e in etapas.items())
+            print(f"{tipo:22} {quantidade:4d} fotos  {resumo}", flush=True)
+    return casos
+
+
+def comparar(atual, anterior, limiar):
+    """Imprime a variação de tempo por etapa e retorna as regressões acima do limiar"""
+    referencia = {(c["tipo"], c["quantidade"]): c["etapas"] for c in anterior["casos"]}
+    regressoes = []
+    for caso in atual["casos"]:
+        etapas_anteriores = referencia.get((caso["tipo"], caso["quantidade"]))
+        if not etapas_anteriores:
+            continue
+        for nome, etapa in caso["etapas"].items():
+            if nome not in etapas_anteriores or not etapas_anteriores[nome]["parede_s"]:
+                continue
+            variacao = etapa["parede_s"] / etapas_anteriores[nome]["parede_s"] - 1
+            marcador = ""
+            if variacao > limiar:
+                marcador = "  <-- REGRESSÃO"
+                regressoes.append((caso["tipo"], caso["quantidade"], nome, variacao))
+            print(f"{caso['tipo']:22} {caso['quantidade']:4d} {nome:22} {variacao:+7.1%}{marcador}")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de geração do relatório")
+    parser.add_argument("--quantidades", default="1,10,50,200")
+    parser.add_argument("--saida", default="benchmark_resultados.json")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    parser.add_argument("--limiar", type=float, default=0.2, help="aumento de tempo tolerado (0.2 = 20%%)")
+    parser.add_argument("--pasta-fixtures", default=os.path.join(tempfile.gettempdir(), "relatorio_bench_fixtures"))
+    parser.add_argument("--timeout-caso", type=float, default=1800, help="segundos por caso antes de desistir")
+    args = parser.parse_args(argv)
+
+    quantidades = [int(q) for q in args.quantidades.split(",")]
+    resultado = {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "casos": executar(quantidades, args.pasta_fixtures, args.timeout_caso),
+    }
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+    print(f"\nResultados salvos em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            anterior = json.load(arquivo)
+        print(f"\nComparação com {args.comparar}:")
+        if comparar(resultado, anterior, args.limiar):
+            return 1
+    if any("falha" in caso for caso in resultado["casos"]):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
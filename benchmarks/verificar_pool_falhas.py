@@ -0,0 +1,70 @@
+"""Verifica que um trabalho que derruba o pool compartilhado não faz falhar o trabalho de outras sessões.
+
+Uso: python benchmarks/verificar_pool_falhas.py [--rodadas 3]
+
+Cenário: PoolCompartilhado(2), três trabalhos de 1 s da sessão s1 e um trabalho da
+sessão s2 que mata o próprio worker. Os três de s1 têm de terminar; só o de s2 falha.
+Sai com código 1 se alguma rodada der errado.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pool_processos import PoolCompartilhado  # noqa: E402
+
+
+def dormir(segundos):
+    time.sleep(segundos)
+    return segundos
+
+
+def derrubar_worker():
+    os._exit(1)
+
+
+def rodada():
+    """Retorna a lista de problemas encontrados (vazia se tudo deu certo)"""
+    pool = PoolCompartilhado(2)
+    pool.iniciar()
+    normais = [pool.enviar("s1", dormir, 1) for _ in range(3)]
+    ruim = pool.enviar("s2", derrubar_worker)
+    problemas = []
+    for i, futuro in enumerate(normais, 1):
+        try:
+            futuro.result(timeout=120)
+        except Exception as e:
+            problemas.append(f"trabalho {i} de s1 falhou: {type(e).__name__}")
+    try:
+        ruim.result(timeout=120)
+        problemas.append("o trabalho de s2 não falhou")
+    except BrokenProcessPool:
+        pass
+    except Exception as e:
+        problemas.append(f"o trabalho de s2 falhou com {type(e).__name__}, não BrokenProcessPool")
+    # Depois da falha, o pool continua atendendo
+    try:
+        pool.enviar("s1", dormir, 0).result(timeout=120)
+    except Exception as e:
+        problemas.append(f"pool não se recuperou: {type(e).__name__}")
+    return problemas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trabalho que derruba o pool x trabalhos de outras sessões")
+    parser.add_argument("--rodadas", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    falhas = 0
+    for i in range(1, args.rodadas + 1):
+        problemas = rodada()
+        falhas += bool(problemas)
+        print(f"rodada {i}: {'; '.join(problemas) if problemas else 'ok'}", flush=True)
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# Limite de bytes (vale para a memória e para a pasta) e pasta opcional para persistir o cache
+# (configuráveis por variável de ambiente)
+LIMITE_MB_PADRAO = int(os.environ.get("RELATORIO_CACHE_MB", "64"))
+PASTA_CACHE_PADRAO = os.environ.get("RELATORIO_CACHE_DIR", "")
+
+
+def hash_conteudo(dados):
+    """Hash do conteúdo da foto, usado no cache e na deduplicação"""
+    return hashlib.sha256(dados).hexdigest()
+
+
+def chave_imagem(digest, largura_cm, altura_cm, densidade_ppi, encaixe, modo_decodificacao, perfil, motor):
+    """Chave do cache: hash do conteúdo original + parâmetros da redução e da codificação.
+
+    A orientação EXIF vem dos metadados da própria foto, então já está coberta pelo hash.
+    """
+    moldura = "encaixe" if encaixe else "fixo"
+    return f"{digest}-{largura_cm}x{altura_cm}@{densidade_ppi}-{moldura}-{modo_decodificacao}-{perfil}-{motor}"
+
+
+class CacheImagens:
+    """Cache LRU das imagens reduzidas, com limite de memória e persistência opcional em disco.
+
+    A pasta tem o mesmo limite de bytes: passando dele, saem os arquivos usados há mais tempo
+    (pela data de modificação, renovada a cada leitura). Outros processos podem gravar na mesma
+    pasta, então o total é recontado na pasta a cada limpeza.
+    """
+
+    def __init__(self, limite_bytes, pasta=None):
+        self.limite_bytes = limite_bytes
+        self.pasta = pasta or None
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()
+        self._bytes_em_uso = 0
+        self._bytes_em_disco = 0
+        self._lock = threading.Lock()
+        if self.pasta:
+            os.makedirs(self.pasta, exist_ok=True)
+            self._limpar_pasta()
+
+    def _caminho(self, chave):
+        # Sufixo neutro: conforme o perfil, a imagem reduzida é JPEG ou PNG
+        return os.path.join(self.pasta, chave + ".img")
+
+    def obter(self, chave):
+        with self._lock:
+            dados = self._itens.get(chave)
+            if dados is not None:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return dados
+        if self.pasta:
+            caminho = self._caminho(chave)
+            try:
+                with open(caminho, "rb") as arquivo:
+                    dados = arquivo.read()
+            except FileNotFoundError:
+                dados = None
+            if dados is not None:
+                try:
+                    # Usado agora: fica por último na fila de remoção da pasta
+                    os.utime(caminho)
+                except OSError:
+                    pass
+                self._guardar_em_memoria(chave, dados)
+                with self._lock:
+                    self.acertos += 1
+                return dados
+        with self._lock:
+            self.falhas += 1
+        return None
+
+    def guardar(self, chave, dados):
+        self._guardar_em_memoria(chave, dados)
+        if self.pasta and len(dados) <= self.limite_bytes:
+            caminho = self._caminho(chave)
+            temporario = f"{caminho}.{threading.get_ident()}.tmp"
+            with open(temporario, "wb") as arquivo:
+                arquivo.write(dados)
+            os.replace(temporario, caminho)
+            with self._lock:
+                self._bytes_em_disco += len(dados)
+                cheia = self._bytes_em_disco > self.limite_bytes
+            if cheia:
+                self._limpar_pasta()
+
+    def _limpar_pasta(self):
+        """Remove os arquivos usados há mais tempo até a pasta caber no limite"""
+        arquivos = []
+        for entrada in os.scandir(self.pasta):
+            # Os .tmp são gravações em andamento
+            if entrada.name.endswith(".tmp") or not entrada.is_file():
+                continue
+            try:
+                informacoes = entrada.stat()
+            except FileNotFoundError:
+                continue
+            arquivos.append((informacoes.st_mtime, informacoes.st_size, entrada.path))
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= self.limite_bytes:
+                break
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+        with self._lock:
+            self._bytes_em_disco = total
+
+    def _guardar_em_memoria(self, chave, dados):
+        if len(dados) > self.limite_bytes:
+            return
+        with self._lock:
+            anterior = self._itens.pop(chave, None)
+            if anterior is not None:
+                self._bytes_em_uso -= len(anterior)
+            self._itens[chave] = dados
+            self._bytes_em_uso += len(dados)
+            while self._bytes_em_uso > self.limite_bytes:
+                _, removido = self._itens.popitem(last=False)
+                self._bytes_em_uso -= len(removido)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'itens': len(self._itens),
+                'bytes': self._bytes_em_uso,
+                'bytes_em_disco': self._bytes_em_disco,
+            }
+
+
+# Cache compartilhado pelo processo: sobrevive aos reruns do Streamlit e vale para todas as sessões
+cache_padrao = CacheImagens(LIMITE_MB_PADRAO * 1024 * 1024, PASTA_CACHE_PADRAO)
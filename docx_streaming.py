@@ -0,0 +1,142 @@
+"""Escrita do .docx do relatório em streaming, sem montar o documento inteiro na memória.
+
+As imagens são reduzidas em pequenos lotes e gravadas direto no zip à medida que
+ficam prontas; só o XML dos blocos de fotos (tabelas e referências às imagens)
+fica acumulado até o final. O cabeçalho do relatório, o timbrado e os estilos
+vêm do modelo já preparado (ver modelo_docx), que só recebe os campos e as fotos.
+"""
+import hashlib
+import zipfile
+
+from layout import layout_padrao, tabela_xml
+from metricas import medir
+from modelo_docx import campos_relatorio, carregar_modelo, paragrafo_xml
+from processamento_imagens import PERFIL_PLACA_PADRAO, WORKERS_PADRAO, reduzir_imagens_em_paralelo
+
+EMU_POR_CM = 360000
+
+_TIPO_REL_IMAGEM = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+
+
+def _imagem_inline(id_rel, id_desenho, largura_emu, altura_emu):
+    return (
+        f'<w:r><w:drawing><wp:inline><wp:extent cx="{largura_emu}" cy="{altura_emu}"/>'
+        f'<wp:docPr id="{id_desenho}" name="Picture {id_desenho}"/>'
+        '<wp:cNvGraphicFramePr><a:graphicFrameLocks noChangeAspect="1"/></wp:cNvGraphicFramePr>'
+        '<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+        f'<pic:pic><pic:nvPicPr><pic:cNvPr id="0" name="image{id_desenho}.jpg"/><pic:cNvPicPr/></pic:nvPicPr>'
+        f'<pic:blipFill><a:blip r:embed="{id_rel}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+        f'<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{largura_emu}" cy="{altura_emu}"/></a:xfrm>'
+        '<a:prstGeom prst="rect"/></pic:spPr></pic:pic></a:graphicData></a:graphic></wp:inline></w:drawing></w:r>'
+    )
+
+
+def _extensao(dados):
+    return "png" if dados[:8] == b"\x89PNG\r\n\x1a\n" else "jpeg"
+
+
+class EscritorDocxStreaming:
+    """Monta o .docx gravando cada imagem no zip assim que ela fica pronta"""
+
+    def __init__(self, destino, modelo=None):
+        self._modelo = modelo or carregar_modelo()
+        self._zip = zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_DEFLATED)
+        self._corpo = []
+        self._relacoes = []
+        self._extensoes = set()
+        self._por_hash = {}
+        self._desenhos = self._modelo.primeiro_id_desenho - 1
+
+    def paragrafo(self, texto, estilo=None):
+        self._corpo.append(paragrafo_xml(texto, self._modelo.estilo(estilo) if estilo else None))
+
+    def titulo(self, texto, nivel=1):
+        self.paragrafo(texto, f"Heading{nivel}")
+
+    def bloco_imagens(self, titulo, imagens_data, layout=None, workers=None, progresso=None, perfil=None,
+                      imagens_reduzidas=None):
+        """Separador, título e a tabela de fotos, reduzindo e gravando as fotos em lotes
+        (ou usando direto as `imagens_reduzidas`, se já vierem prontas)"""
+        layout = layout or layout_padrao
+        self.paragrafo("------------------------------------------")
+        self.titulo(titulo, nivel=2)
+        tamanho_lote = workers or WORKERS_PADRAO
+        imagens_data = list(imagens_data)
+        planejadas = layout.planejar(imagens_data)
+        celulas = []
+        for inicio in range(0, len(imagens_data), tamanho_lote):
+            lote = imagens_data[inicio:inicio + tamanho_lote]
+            if imagens_reduzidas is not None:
+                reduzidas = imagens_reduzidas[inicio:inicio + tamanho_lote]
+            else:
+                reduzidas = reduzir_imagens_em_paralelo(lote, *layout.moldura_cm, workers=workers,
+                                                        progresso=progresso, perfil=perfil, encaixe=True)
+            for img_buffer, (largura_cm, altura_cm, legenda) in zip(reduzidas, planejadas[inicio:]):
+                id_rel = self._gravar_imagem(img_buffer.getvalue())
+                self._desenhos += 1
+                run = _imagem_inline(id_rel, self._desenhos, int(largura_cm * EMU_POR_CM), int(altura_cm * EMU_POR_CM))
+                celulas.append((run, legenda))
+        self._corpo.append(tabela_xml(layout, celulas, self._modelo.estilo("Caption")))
+
+    def _gravar_imagem(self, dados):
+        # Imagens idênticas compartilham a mesma parte do pacote
+        digest = hashlib.sha1(dados).hexdigest()
+        if digest in self._por_hash:
+            return self._por_hash[digest]
+        extensao = _extensao(dados)
+        numero = len(self._relacoes) + 1
+        id_rel = f"rIdImg{numero}"
+        # Nome próprio para não colidir com as imagens do timbrado (media/image1.png, ...)
+        alvo = f"media/foto{numero}.{extensao}"
+        # JPEG/PNG já são comprimidos; gravar sem deflate economiza CPU
+        self._zip.writestr(f"word/{alvo}", dados, compress_type=zipfile.ZIP_STORED)
+        self._relacoes.append((id_rel, alvo))
+        self._extensoes.add(extensao)
+        self._por_hash[digest] = id_rel
+        return id_rel
+
+    def abortar(self):
+        """Fecha o zip sem completar o documento (usado quando a geração falha)"""
+        self._zip.close()
+
+    def fechar(self, campos):
+        """Completa o documento com as partes do modelo, os `campos` preenchidos e as fotos"""
+        for nome, conteudo in self._modelo.partes.items():
+            self._zip.writestr(nome, conteudo)
+        for nome, conteudo in self._modelo.partes_preenchidas(campos, "".join(self._corpo)).items():
+            self._zip.writestr(nome, conteudo)
+        self._corpo = []
+
+        self._zip.writestr("word/_rels/document.xml.rels", self._modelo.relacoes_xml("".join(
+            f'<Relationship Id="{id_rel}" Type="{_TIPO_REL_IMAGEM}" Target="{alvo}"/>'
+            for id_rel, alvo in self._relacoes
+        )))
+        self._zip.writestr("[Content_Types].xml", self._modelo.tipos_xml(self._extensoes))
+        self._zip.close()
+
+
+def escrever_relatorio_streaming(destino, site_id, data_execucao, localizacao, fotos_antes=None, fotos_depois=None,
+                                 foto_placa=None, workers=None, progresso=None, perfil=None, perfil_placa=None,
+                                 layout=None, blocos=None):
+    """Gera o relatório direto em `destino` (caminho ou arquivo aberto) a partir do modelo, com memória limitada.
+
+    Com `blocos` (ver relatorio.reduzir_blocos) as fotos já reduzidas são gravadas sem reduzir de novo.
+    """
+    escritor = EscritorDocxStreaming(destino)
+    try:
+        if blocos is not None:
+            for titulo, imagens_data, reduzidas in blocos:
+                escritor.bloco_imagens(titulo, imagens_data, layout, imagens_reduzidas=reduzidas)
+        else:
+            if fotos_antes:
+                escritor.bloco_imagens("FOTOS - ANTES", fotos_antes, layout, workers, progresso, perfil)
+            if fotos_depois:
+                escritor.bloco_imagens("FOTOS - DEPOIS", fotos_depois, layout, workers, progresso, perfil)
+            if foto_placa:
+                escritor.bloco_imagens("PLACA DE IDENTIFICAÇÃO", [foto_placa], layout, workers, progresso,
+                                       perfil_placa or PERFIL_PLACA_PADRAO)
+    except BaseException:
+        escritor.abortar()
+        raise
+    with medir("gravacao_docx"):
+        escritor.fechar(campos_relatorio(site_id, data_execucao, localizacao))
@@ -0,0 +1,105 @@
+"""Vários relatórios (um por site) num único .zip.
+
+Os relatórios (.docx, .pdf ou os dois) são gerados em paralelo, cada um num
+arquivo temporário. Assim que um fica pronto, ele é copiado para o .zip e
+apagado, então o .zip cresce à medida que os relatórios terminam e no máximo
+`workers` relatórios existem ao mesmo tempo (em memória ou em disco), qualquer
+que seja o tamanho do lote.
+
+Configuração por variável de ambiente:
+    RELATORIO_ZIP_WORKERS  relatórios gerados ao mesmo tempo (padrão 2)
+"""
+import contextvars
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from metricas import contar_bytes, medir
+from relatorio import escrever_relatorios, nome_arquivo_relatorio, nome_unico
+
+WORKERS_ZIP_PADRAO = int(os.environ.get("RELATORIO_ZIP_WORKERS", "2"))
+MIME_ZIP = "application/zip"
+
+
+def nome_arquivo_zip(sites):
+    """Nome padrão do .zip: quantidade de sites e período das execuções"""
+    datas = sorted(site['data_execucao'] for site in sites)
+    periodo = datas[0].strftime('%Y-%m-%d')
+    if datas[-1] != datas[0]:
+        periodo += f" a {datas[-1].strftime('%Y-%m-%d')}"
+    return f"RLT. ZELADORIA - {len(sites)} sites - {periodo}.zip"
+
+
+def _gerar_site(site, pasta, progresso, perfil, perfil_placa, layout, formatos):
+    """Grava um arquivo temporário por formato (as fotos são reduzidas uma vez só). Retorna {formato: caminho}"""
+    caminhos = {}
+    try:
+        for formato in formatos:
+            descritor, caminhos[formato] = tempfile.mkstemp(suffix=f".{formato}", dir=pasta)
+            os.close(descritor)
+        escrever_relatorios(caminhos, site['site_id'], site['data_execucao'], site['localizacao'],
+                            site.get('fotos_antes'), site.get('fotos_depois'), site.get('foto_placa'),
+                            progresso=progresso, perfil=perfil, perfil_placa=perfil_placa, layout=layout)
+    except BaseException:
+        for caminho in caminhos.values():
+            os.remove(caminho)
+        raise
+    return caminhos
+
+
+def escrever_zip(destino, sites, workers=None, progresso=None, perfil=None, perfil_placa=None, layout=None,
+                 formatos=("docx",)):
+    """Grava em `destino` (caminho ou arquivo aberto) um .zip com o relatório de cada site em cada um dos `formatos`.
+
+    Cada site é um dict com site_id, data_execucao, localizacao, fotos_antes, fotos_depois e foto_placa.
+    Um site com erro não interrompe os outros. Retorna (sites gravados no .zip, [(site_id, erro)]).
+    """
+    workers = max(1, workers or WORKERS_ZIP_PADRAO)
+    lock = threading.Lock()
+
+    def avancar(quantidade):
+        if progresso:
+            with lock:
+                progresso(quantidade)
+
+    gravados, falhas, usados = [], [], set()
+    pendentes = iter(sites)
+    em_andamento = {}
+    # .docx e .pdf já são compactados: guardar sem recompactar poupa CPU e quase não muda o tamanho
+    with tempfile.TemporaryDirectory(prefix="relatorios-zip-") as pasta, \
+            zipfile.ZipFile(destino, "w", zipfile.ZIP_STORED) as arquivo_zip, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="relatorio-zip") as executor:
+
+        def enviar_proximo():
+            site = next(pendentes, None)
+            if site is not None:
+                # Cada thread herda a sessão do pool e o coletor de métricas de quem pediu o .zip
+                contexto = contextvars.copy_context()
+                futuro = executor.submit(contexto.run, _gerar_site, site, pasta, avancar, perfil, perfil_placa,
+                                         layout, formatos)
+                em_andamento[futuro] = site
+
+        for _ in range(workers):
+            enviar_proximo()
+        while em_andamento:
+            prontos, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                site = em_andamento.pop(futuro)
+                try:
+                    caminhos = futuro.result()
+                except Exception as e:
+                    falhas.append((site['site_id'], str(e)))
+                else:
+                    for formato, caminho in caminhos.items():
+                        nome = nome_unico(nome_arquivo_relatorio(site['site_id'], site['data_execucao'], formato),
+                                          usados)
+                        with medir("empacotamento_zip"):
+                            arquivo_zip.write(caminho, nome)
+                        contar_bytes(formato, os.path.getsize(caminho))
+                        os.remove(caminho)
+                    gravados.append(site)
+                # O próximo site só começa depois que o anterior saiu do disco
+                enviar_proximo()
+    return gravados, falhas
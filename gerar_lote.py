@@ -0,0 +1,179 @@
+"""Geração de relatórios em lote, sem a interface do Streamlit.
+
+Uso:
+    python gerar_lote.py PASTA_OU_MANIFESTO [--saida PASTA] [--processos N] [--perfil NOME] [--perfil-placa NOME]
+                         [--colunas N] [--formato docx|pdf|ambos]
+
+PASTA deve ter uma subpasta por site, com as fotos em antes/, depois/ e placa/.
+Um arquivo site.json opcional na pasta do site pode informar
+"data_execucao" (AAAA-MM-DD) e "localizacao".
+
+MANIFESTO é um .json com uma lista de sites:
+    [{"site_id": "SP001", "data_execucao": "2024-05-31", "localizacao": "São Paulo - SP",
+      "antes": "SP001/antes", "depois": "SP001/depois", "placa": "SP001/placa/placa.jpg"}]
+Os caminhos podem ser pastas ou arquivos e são relativos ao manifesto.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+
+from layout import Layout
+from processamento_imagens import PERFIS_CODIFICACAO
+from relatorio import escrever_relatorios, nome_arquivo_relatorio, nome_unico
+
+EXTENSOES_FOTO = (".jpg", ".jpeg", ".png")
+
+
+def listar_fotos(caminho):
+    """Lista as fotos de uma pasta (em ordem alfabética) ou o próprio arquivo"""
+    if not caminho or not os.path.exists(caminho):
+        return []
+    if os.path.isfile(caminho):
+        return [caminho]
+    return [
+        os.path.join(caminho, nome) for nome in sorted(os.listdir(caminho))
+        if nome.lower().endswith(EXTENSOES_FOTO)
+    ]
+
+
+def carregar_sites_de_pasta(raiz, data_padrao, localizacao_padrao):
+    sites = []
+    for site_id in sorted(os.listdir(raiz)):
+        pasta_site = os.path.join(raiz, site_id)
+        if not os.path.isdir(pasta_site):
+            continue
+        info = {}
+        arquivo_info = os.path.join(pasta_site, "site.json")
+        if os.path.exists(arquivo_info):
+            with open(arquivo_info, encoding="utf-8") as arquivo:
+                info = json.load(arquivo)
+        sites.append({
+            'site_id': info.get('site_id', site_id),
+            'data_execucao': info.get('data_execucao', data_padrao),
+            'localizacao': info.get('localizacao', localizacao_padrao),
+            'antes': listar_fotos(os.path.join(pasta_site, "antes")),
+            'depois': listar_fotos(os.path.join(pasta_site, "depois")),
+            'placa': listar_fotos(os.path.join(pasta_site, "placa"))[:1],
+        })
+    return sites
+
+
+def carregar_sites_de_manifesto(caminho_manifesto, data_padrao, localizacao_padrao):
+    base = os.path.dirname(os.path.abspath(caminho_manifesto))
+    with open(caminho_manifesto, encoding="utf-8") as arquivo:
+        entradas = json.load(arquivo)
+
+    def resolver(caminho):
+        return listar_fotos(os.path.join(base, caminho)) if caminho else []
+
+    return [{
+        'site_id': entrada['site_id'],
+        'data_execucao': entrada.get('data_execucao', data_padrao),
+        'localizacao': entrada.get('localizacao', localizacao_padrao),
+        'antes': resolver(entrada.get('antes')),
+        'depois': resolver(entrada.get('depois')),
+        'placa': resolver(entrada.get('placa'))[:1],
+    } for entrada in entradas]
+
+
+def _ler(caminho):
+    with open(caminho, "rb") as arquivo:
+        return arquivo.read()
+
+
+def _data_execucao(site):
+    data_execucao = site['data_execucao']
+    if isinstance(data_execucao, str):
+        data_execucao = datetime.strptime(data_execucao, "%Y-%m-%d").date()
+    return data_execucao
+
+
+def caminhos_saida(site, pasta_saida, formatos, usados):
+    """Um caminho por formato; sites com o mesmo ID e data ganham " (2)", " (3)"... em vez de se sobrescreverem"""
+    data_execucao = _data_execucao(site)
+    return {formato: os.path.join(pasta_saida, nome_unico(nome_arquivo_relatorio(site['site_id'], data_execucao,
+                                                                                formato), usados))
+            for formato in formatos}
+
+
+def gerar_relatorio_site(site, caminhos, perfil=None, perfil_placa=None, layout=None):
+    """Gera e grava o relatório de um site em cada formato de `caminhos` ({formato: caminho}).
+    Retorna (caminhos, quantidade de fotos)"""
+    data_execucao = _data_execucao(site)
+    fotos_antes = [_ler(c) for c in site['antes']]
+    fotos_depois = [_ler(c) for c in site['depois']]
+    foto_placa = _ler(site['placa'][0]) if site['placa'] else None
+
+    # O paralelismo fica entre relatórios, então cada relatório processa suas fotos em série
+    escrever_relatorios(caminhos, site['site_id'], data_execucao, site['localizacao'],
+                        fotos_antes, fotos_depois, foto_placa, workers=1, perfil=perfil, perfil_placa=perfil_placa,
+                        layout=layout)
+    return list(caminhos.values()), len(fotos_antes) + len(fotos_depois) + (1 if foto_placa else 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera relatórios de zeladoria em lote")
+    parser.add_argument("entrada", help="pasta com uma subpasta por site ou manifesto .json")
+    parser.add_argument("--saida", default="relatorios", help="pasta onde os relatórios serão gravados")
+    parser.add_argument("--processos", type=int, default=os.cpu_count(), help="tamanho do pool de processos")
+    parser.add_argument("--data", default=date.today().isoformat(),
+                        help="data de execução padrão (AAAA-MM-DD)")
+    parser.add_argument("--localizacao", default="", help="localização padrão")
+    parser.add_argument("--perfil", choices=sorted(PERFIS_CODIFICACAO), help="codificação das fotos")
+    parser.add_argument("--perfil-placa", choices=sorted(PERFIS_CODIFICACAO), help="codificação da foto da placa")
+    parser.add_argument("--colunas", type=int, help="fotos por linha da tabela")
+    parser.add_argument("--formato", choices=["docx", "pdf", "ambos"], default="docx",
+                        help="formato do relatório (com ambos, as fotos são processadas uma vez só)")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.entrada):
+        sites = carregar_sites_de_pasta(args.entrada, args.data, args.localizacao)
+    else:
+        sites = carregar_sites_de_manifesto(args.entrada, args.data, args.localizacao)
+    if not sites:
+        print("Nenhum site encontrado", file=sys.stderr)
+        return 1
+    os.makedirs(args.saida, exist_ok=True)
+
+    layout = Layout(colunas=args.colunas)
+    formatos = ("docx", "pdf") if args.formato == "ambos" else (args.formato,)
+    inicio = time.perf_counter()
+    total_fotos = 0
+    falhas = 0
+    # Os nomes são escolhidos aqui, antes de distribuir os sites entre os processos
+    usados = set()
+    with ProcessPoolExecutor(max_workers=args.processos) as executor:
+        futures = {}
+        for site in sites:
+            try:
+                caminhos = caminhos_saida(site, args.saida, formatos, usados)
+            except ValueError as e:
+                falhas += 1
+                print(f"❌ {site['site_id']}: {e}", file=sys.stderr)
+                continue
+            futures[executor.submit(gerar_relatorio_site, site, caminhos, args.perfil, args.perfil_placa,
+                                    layout)] = site
+        for future in as_completed(futures):
+            site = futures[future]
+            try:
+                caminhos, quantidade = future.result()
+            except Exception as e:
+                falhas += 1
+                print(f"❌ {site['site_id']}: {e}", file=sys.stderr)
+                continue
+            total_fotos += quantidade
+            print(f"✅ {', '.join(caminhos)} ({quantidade} fotos)")
+
+    duracao = time.perf_counter() - inicio
+    gerados = len(sites) - falhas
+    print(f"\n{gerados} relatório(s) em {duracao:.1f} s - "
+          f"{gerados / duracao * 60:.1f} relatórios/min, {total_fotos / duracao:.1f} imagens/s")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,705 @@
+"""Seções da interface do app, usadas por app.py e app_mobile.py.
+
+O Streamlit reexecuta o script inteiro a cada interação. As seções com interação
+própria (formulário, cada categoria de upload com as miniaturas e o painel lateral)
+são fragmentos: mexer nelas reexecuta só a seção. A página inteira só é refeita
+quando muda algo que outra seção mostra (fotos na sessão, campos preenchidos).
+
+PIL não é importado aqui: a compactação e as miniaturas carregam processamento_imagens
+na primeira foto, e o relatório só é carregado na tarefa.
+"""
+from datetime import datetime
+import hashlib
+import os
+
+import streamlit as st
+
+from cache_imagens import cache_padrao, hash_conteudo
+from metricas import contar_bytes, iniciar_servidor, registro_padrao
+from modelo_docx import carregar_modelo
+from pool_processos import pool_compartilhado, sessao
+from rascunhos import armazem_rascunhos
+from tarefas import CONCLUIDA, gerenciador_padrao, total_fotos_site
+from upload_resumivel import armazem_padrao, dono_uploads, upload_resumivel
+
+CHAVES_FOTOS = ['fotos_antes_data', 'fotos_depois_data', 'foto_placa_data']
+# Opções de formato do relatório; com os dois, as fotos são processadas uma vez só
+OPCOES_FORMATO = {"Word (.docx)": ("docx",), "PDF": ("pdf",), "Word + PDF": ("docx", "pdf")}
+
+ESTILO_MOBILE = """
+<style>
+/* Otimizações para mobile */
+.stFileUploader > div > div > div > div {
+    padding: 1rem !important;
+}
+.mobile-warning {
+    background-color: #fff3e0;
+    padding: 15px;
+    border-radius: 10px;
+    border-left: 4px solid #ff9800;
+    margin: 10px 0;
+    font-size: 14px;
+}
+.success-box {
+    background-color: #e8f5e8;
+    padding: 15px;
+    border-radius: 10px;
+    border-left: 4px solid #4caf50;
+    margin: 10px 0;
+}
+.info-box {
+    background-color: #e3f2fd;
+    padding: 15px;
+    border-radius: 10px;
+    border-left: 4px solid #2196f3;
+    margin: 10px 0;
+}
+/* Melhor visualização em telas pequenas */
+@media (max-width: 768px) {
+    .stButton > button {
+        width: 100% !important;
+        font-size: 16px !important;
+        padding: 12px !important;
+    }
+    .stFileUploader {
+        margin-bottom: 20px !important;
+    }
+}
+</style>
+"""
+
+AVISO_MOBILE = """
+<div class="mobile-warning">
+    <strong>📱 IMPORTANTE - Usuários de celular:</strong><br>
+    • Preencha TODOS os campos de texto primeiro<br>
+    • Faça upload de UMA categoria de fotos por vez<br>
+    • Aguarde a confirmação "✅ carregada com sucesso" antes do próximo upload<br>
+    • NÃO saia do navegador durante o upload<br>
+    • Se der "reconnecting", recarregue a página e tente novamente
+</div>
+"""
+
+DICA_UPLOAD = """
+<div class="info-box">
+    <strong>💡 Dica:</strong> No celular, toque em "Browse files" → Escolha "Câmera" ou "Galeria" → Selecione as fotos → Aguarde o upload completar
+</div>
+"""
+
+DICAS_MOBILE = """
+**Se der erro "reconnecting":**
+1. Recarregue a página (F5)
+2. Preencha os dados novamente
+3. Faça upload UMA categoria por vez
+4. Aguarde confirmação antes da próxima
+5. Gere o relatório imediatamente
+
+**Para melhor experiência:**
+- Use WiFi ao invés de dados móveis
+- Feche outros apps durante o upload
+- Mantenha a tela ligada
+"""
+
+@st.cache_resource
+def iniciar_servicos():
+    """Endpoint /metrics opcional, pool de processos de imagem e modelo do .docx: uma vez por processo do servidor"""
+    iniciar_servidor()
+    pool_compartilhado.iniciar()
+    # Prepara o modelo (RELATORIO_MODELO_DOCX) já na subida: um caminho errado aparece logo, não no 1º relatório
+    carregar_modelo()
+
+def criar_interface_mobile_friendly():
+    """Cria uma interface otimizada para mobile"""
+    st.markdown(ESTILO_MOBILE, unsafe_allow_html=True)
+
+def identificar_foto(foto):
+    """Identificador estável da foto enviada: file_id do Streamlit ou hash do conteúdo"""
+    file_id = getattr(foto, 'file_id', None)
+    if file_id:
+        return file_id
+    return hashlib.sha1(foto.getbuffer()).hexdigest()
+
+def buscar_foto_por_hash(digest):
+    """Procura nas categorias da sessão uma foto já preparada com o mesmo conteúdo"""
+    for chave in CHAVES_FOTOS:
+        for foto in st.session_state.get(chave, {}).values():
+            if foto.get('hash') == digest:
+                return foto
+    return None
+
+def no_pool(funcao, *args):
+    """Executa o trabalho de imagem no pool compartilhado, na fila desta sessão"""
+    with sessao(st.session_state.get('rascunho_token')):
+        return pool_compartilhado.executar(funcao, *args)
+
+def miniatura(foto):
+    """Miniatura da foto, gerada uma vez e guardada no próprio registro"""
+    if 'thumb' not in foto:
+        from processamento_imagens import gerar_miniatura
+        foto['thumb'] = no_pool(gerar_miniatura, foto['data'])
+    return foto['thumb']
+
+def preparar_foto(nome, dados, tamanho_original, origem='upload', vizinhas=()):
+    """Monta o registro da foto no session state, já compactada, com miniatura e com o controle de qualidade.
+
+    Se a mesma foto já estiver na sessão (em qualquer categoria), reaproveita os bytes, a miniatura e as métricas.
+    `vizinhas` são as fotos já aceitas na mesma categoria, na ordem das miniaturas, para apontar fotos quase iguais.
+    Retorna (registro, problemas); um arquivo que não abre como foto e, com RELATORIO_QUALIDADE=descartar,
+    uma foto com problema voltam sem registro (None) e nem chegam a ser compactados.
+    """
+    from processamento_imagens import ERROS_ARQUIVO_INVALIDO, compactar_foto, gerar_miniatura
+    from qualidade_fotos import MODO_QUALIDADE, avaliar_foto, problemas_foto
+
+    digest = hash_conteudo(dados)
+    existente = buscar_foto_por_hash(digest)
+    qualidade, problemas = None, []
+    try:
+        if MODO_QUALIDADE != "desligado":
+            qualidade = existente.get('qualidade') if existente is not None else None
+            if qualidade is None:
+                # Métricas numa prévia pequena, antes da compactação
+                qualidade = no_pool(avaliar_foto, dados)
+            assinaturas = [(foto.get('qualidade') or {}).get('assinatura') for foto in vizinhas]
+            problemas = problemas_foto(qualidade, assinaturas)
+            if problemas and MODO_QUALIDADE == "descartar":
+                return None, problemas
+        if existente is not None:
+            registro = dict(existente)
+            registro.update({'name': nome, 'original_size': tamanho_original, 'origem': origem,
+                             'qualidade': qualidade, 'problemas': problemas})
+            return registro, problemas
+        dados, tipo = no_pool(compactar_foto, dados)
+        miniatura_foto = no_pool(gerar_miniatura, dados)
+    except ERROS_ARQUIVO_INVALIDO:
+        # Sem isso o erro voltaria a cada reexecução enquanto o arquivo continuasse selecionado
+        return None, ["arquivo inválido (não é uma foto JPEG ou PNG legível)"]
+    return {
+        'name': nome,
+        'size': len(dados),
+        'original_size': tamanho_original,
+        'type': tipo,
+        'data': dados,
+        'thumb': miniatura_foto,
+        'origem': origem,
+        'hash': digest,
+        'qualidade': qualidade,
+        'problemas': problemas
+    }, problemas
+
+def salvar_fotos_session_state(fotos, chave, unica=False):
+    """Sincroniza as fotos enviadas com o session state.
+
+    Só lê os bytes das fotos que ainda não estão salvas; as que o usuário removeu do upload são descartadas.
+    As fotos novas são guardadas já compactadas (ver RELATORIO_COMPACTAR_PX).
+    Fotos recebidas pelo envio resumível ou recuperadas do rascunho não são afetadas (na placa, `unica`,
+    uma foto aceita no upload substitui a anterior).
+    Fotos recusadas pelo controle de qualidade ficam em `recusadas_{chave}` e não são avaliadas de novo.
+    """
+    if fotos:
+        fotos_salvas = st.session_state.get(chave, {})
+        recusadas = st.session_state.get(f"recusadas_{chave}", {})
+        selecionadas = {identificar_foto(foto): foto for foto in fotos}
+        # A ordem é a das miniaturas: as que já estavam continuam no lugar e as novas entram no fim.
+        # Cada foto nova é comparada com as anteriores nessa ordem, então "quase igual à foto N" é a N-ésima
+        fotos_data = {id_foto: foto for id_foto, foto in fotos_salvas.items()
+                      if foto.get('origem') != 'upload' or id_foto in selecionadas}
+        novas = {}
+        recusadas_agora = {}
+        for id_foto, foto in selecionadas.items():
+            if id_foto in fotos_data:
+                continue
+            if id_foto in recusadas:
+                recusadas_agora[id_foto] = recusadas[id_foto]
+                continue
+            registro, problemas = preparar_foto(foto.name, foto.getvalue(), foto.size,
+                                                vizinhas=list(fotos_data.values()))
+            if registro is None:
+                recusadas_agora[id_foto] = {'name': foto.name, 'problemas': problemas, 'origem': 'upload'}
+            else:
+                fotos_data[id_foto] = novas[id_foto] = registro
+        if unica and novas:
+            fotos_data = novas
+        # Recusas do envio resumível continuam; as do upload valem só para os arquivos ainda selecionados
+        recusadas_agora.update({i: r for i, r in recusadas.items() if r['origem'] == 'resumivel'})
+        st.session_state[f"recusadas_{chave}"] = recusadas_agora
+        st.session_state[chave] = fotos_data
+        return True
+    return False
+
+def adicionar_fotos_resumiveis(fotos, chave, unica=False):
+    """Acrescenta ao session state as fotos que chegaram inteiras pelo envio resumível"""
+    fotos_salvas = st.session_state.get(chave, {})
+    recusadas = st.session_state.setdefault(f"recusadas_{chave}", {})
+    novas = {id_foto: foto for id_foto, foto in fotos.items()
+             if id_foto not in fotos_salvas and id_foto not in recusadas}
+    if not novas:
+        return 0
+    if unica:
+        novas = dict([list(novas.items())[-1]])
+    fotos_data = {} if unica else dict(fotos_salvas)
+    aceitas = 0
+    for id_foto, foto in novas.items():
+        registro, problemas = preparar_foto(foto['name'], foto['data'], foto['size'], origem='resumivel',
+                                            vizinhas=list(fotos_data.values()))
+        if registro is None:
+            recusadas[id_foto] = {'name': foto['name'], 'problemas': problemas, 'origem': 'resumivel'}
+        else:
+            fotos_data[id_foto] = registro
+            aceitas += 1
+    # Na placa, uma foto nova recusada não tira a anterior
+    if aceitas:
+        st.session_state[chave] = fotos_data
+    return aceitas
+
+def remover_fotos_rascunho(chave):
+    """Tira da categoria as fotos recuperadas do rascunho; retorna quantas saíram"""
+    fotos_salvas = st.session_state.get(chave, {})
+    fotos_data = {id_foto: foto for id_foto, foto in fotos_salvas.items() if foto.get('origem') != 'rascunho'}
+    st.session_state[chave] = fotos_data
+    return len(fotos_salvas) - len(fotos_data)
+
+def recuperar_fotos_session_state(chave):
+    """Recupera as fotos do session state"""
+    return list(st.session_state.get(chave, {}).values())
+
+def memoria_fotos_sessao():
+    """Retorna (bytes guardados, bytes originais, bytes poupados pela deduplicação) das fotos da sessão"""
+    guardados = originais = duplicados = 0
+    vistos = set()
+    for chave in CHAVES_FOTOS:
+        for foto in recuperar_fotos_session_state(chave):
+            originais += foto.get('original_size', foto['size'])
+            if id(foto['data']) in vistos:
+                duplicados += len(foto['data'])
+                continue
+            vistos.add(id(foto['data']))
+            guardados += len(foto['data'])
+    return guardados, originais, duplicados
+
+def restaurar_rascunho():
+    """Carrega o rascunho indicado na URL (ou cria um novo) na primeira execução da sessão"""
+    token = st.query_params.get('rascunho')
+    rascunho = armazem_rascunhos.carregar(token) if token else None
+    if rascunho is None:
+        token = armazem_rascunhos.novo_token()
+        st.query_params['rascunho'] = token
+    else:
+        st.session_state.site_id = rascunho['site_id']
+        st.session_state.localizacao = rascunho['localizacao']
+        if rascunho['data_execucao']:
+            st.session_state.data_execucao = rascunho['data_execucao']
+        st.session_state.rascunho_campos = (rascunho['site_id'], rascunho['data_execucao'], rascunho['localizacao'])
+        for chave in CHAVES_FOTOS:
+            fotos_data = rascunho['fotos'].get(chave, {})
+            for foto in fotos_data.values():
+                # Os file_ids da sessão anterior não voltam no upload: sem isso, o próximo envio as apagaria
+                if foto['origem'] == 'upload':
+                    foto['origem'] = 'rascunho'
+            if fotos_data:
+                st.session_state[chave] = fotos_data
+            st.session_state[f"rascunho_{chave}"] = set(fotos_data)
+    st.session_state.rascunho_token = token
+    armazem_rascunhos.limpar_expirados()
+
+def salvar_rascunho():
+    """Grava no rascunho só o que mudou desde a última execução"""
+    token = st.session_state.rascunho_token
+    campos = (st.session_state.site_id, st.session_state.data_execucao, st.session_state.localizacao)
+    if st.session_state.get('rascunho_campos') != campos:
+        armazem_rascunhos.salvar_campos(token, *campos)
+        st.session_state.rascunho_campos = campos
+    for chave in CHAVES_FOTOS:
+        fotos_data = st.session_state.get(chave, {})
+        ja_salvas = st.session_state.get(f"rascunho_{chave}", set())
+        if set(fotos_data) != ja_salvas:
+            st.session_state[f"rascunho_{chave}"] = armazem_rascunhos.salvar_fotos(token, chave, fotos_data, ja_salvas)
+
+def mostrar_previews(fotos_data, rotulo, chave, colunas=4, por_pagina=8):
+    """Mostra as miniaturas das fotos numa grade paginada"""
+    if not fotos_data:
+        return
+    total_paginas = (len(fotos_data) + por_pagina - 1) // por_pagina
+    pagina = 1
+    if total_paginas > 1:
+        pagina = st.number_input(
+            f"Página ({total_paginas} no total)", min_value=1, max_value=total_paginas,
+            value=1, step=1, key=f"pagina_{chave}"
+        )
+    inicio = (pagina - 1) * por_pagina
+    cols = st.columns(colunas)
+    for i, foto in enumerate(fotos_data[inicio:inicio + por_pagina], start=inicio):
+        with cols[(i - inicio) % colunas]:
+            aviso = " ⚠️" if foto.get('problemas') else ""
+            st.image(miniatura(foto), caption=f"{rotulo} {i+1}{aviso}", width=150)
+
+def mostrar_avisos_qualidade(fotos_data, rotulo, chave):
+    """Lista as fotos marcadas pelo controle de qualidade e as que foram recusadas"""
+    for i, foto in enumerate(fotos_data, start=1):
+        if foto.get('problemas'):
+            st.warning(f"⚠️ {rotulo} {i}: {', '.join(foto['problemas'])}")
+    for recusada in st.session_state.get(f"recusadas_{chave}", {}).values():
+        st.warning(f"🚫 {recusada['name']} não foi aceita: {', '.join(recusada['problemas'])}")
+
+def resumo_formulario():
+    """O que as outras seções mostram do formulário (campos preenchidos e data)"""
+    return bool(st.session_state.site_id), bool(st.session_state.localizacao), st.session_state.data_execucao
+
+@st.fragment
+def secao_formulario():
+    """Campos do relatório; digitar só reexecuta esta seção"""
+    resumo_anterior = resumo_formulario()
+    col1, col2 = st.columns(2)
+    with col1:
+        site_id = st.text_input(
+            "ID do site",
+            value=st.session_state.site_id,
+            key="input_site_id",
+            help="Digite o ID do site"
+        )
+        if site_id != st.session_state.site_id:
+            st.session_state.site_id = site_id
+
+    with col2:
+        data_execucao = st.date_input(
+            "Data da execução",
+            value=st.session_state.data_execucao,
+            key="input_data"
+        )
+        if data_execucao != st.session_state.data_execucao:
+            st.session_state.data_execucao = data_execucao
+
+    localizacao = st.text_input(
+        "Localização (cidade - estado)",
+        value=st.session_state.localizacao,
+        key="input_localizacao",
+        help="Digite a localização completa"
+    )
+    if localizacao != st.session_state.localizacao:
+        st.session_state.localizacao = localizacao
+
+    # Status dos dados salvos
+    if st.session_state.site_id and st.session_state.localizacao:
+        st.success("✅ Dados do formulário salvos!")
+
+    salvar_rascunho()
+    # Campo que passou a estar (ou deixou de estar) preenchido muda o status e o botão de gerar
+    if resumo_formulario() != resumo_anterior:
+        st.rerun()
+
+def chave_upload(sufixo):
+    """Chave do file_uploader; muda quando o site em edição é esvaziado, para limpar os arquivos da tela"""
+    versao = st.session_state.get('versao_uploads', 0)
+    return f"upload_{sufixo}_{versao}" if versao else f"upload_{sufixo}"
+
+def limpar_site_atual():
+    """Esvazia os campos e as fotos do site em edição, inclusive os arquivos que estão nos uploads"""
+    for key in CHAVES_FOTOS + ['input_site_id', 'input_localizacao']:
+        st.session_state.pop(key, None)
+        st.session_state.pop(f"recusadas_{key}", None)
+    for chave_resumivel in ['resumivel_antes', 'resumivel_depois', 'resumivel_placa']:
+        for id_upload in st.session_state.pop(f"{chave_resumivel}_ids", []):
+            armazem_padrao.remover(dono_uploads(), id_upload)
+        st.session_state.pop(chave_resumivel, None)
+    st.session_state.site_id = ""
+    st.session_state.localizacao = ""
+    st.session_state.versao_uploads = st.session_state.get('versao_uploads', 0) + 1
+
+@st.fragment
+def secao_fotos(chave, titulo, rotulo, nome, multiplas=True):
+    """Upload de uma categoria de fotos com as miniaturas e o envio resumível.
+
+    Paginar as miniaturas só reexecuta esta seção; a página inteira é refeita quando as fotos mudam.
+    """
+    ids_anteriores = set(st.session_state.get(chave, {}))
+    sufixo = chave.split('_')[-2]
+    st.markdown(f"### {titulo}")
+    if multiplas:
+        fotos = st.file_uploader(
+            f"📸 Selecione as fotos do {nome}",
+            type=["jpg", "jpeg", "png"],
+            accept_multiple_files=True,
+            key=chave_upload(sufixo),
+            help="Você pode selecionar múltiplas fotos de uma vez"
+        )
+    else:
+        foto = st.file_uploader(
+            f"📸 Selecione a foto da {nome} DE IDENTIFICAÇÃO",
+            type=["jpg", "jpeg", "png"],
+            key=chave_upload(sufixo),
+            help="Apenas uma foto da placa"
+        )
+        fotos = [foto] if foto else []
+
+    if fotos and salvar_fotos_session_state(fotos, chave, unica=not multiplas) and st.session_state[chave]:
+        if multiplas:
+            aceitas = len(st.session_state[chave])
+            st.markdown(f"<div class='success-box'>✅ {aceitas} foto(s) {nome} carregada(s) com sucesso!</div>",
+                        unsafe_allow_html=True)
+            # Preview das fotos (miniaturas geradas no servidor)
+            mostrar_previews(recuperar_fotos_session_state(chave), rotulo, chave)
+        else:
+            st.markdown(f"<div class='success-box'>✅ Foto da {nome} carregada com sucesso!</div>",
+                        unsafe_allow_html=True)
+            for foto in recuperar_fotos_session_state(chave):
+                st.image(miniatura(foto), caption=rotulo, width=200)
+
+    with st.expander("📶 Conexão instável? Envio resumível"):
+        st.caption("Envia uma foto por vez, em partes. Se a conexão cair, o envio continua de onde parou.")
+        alvo = f"fotos do {nome}" if multiplas else f"foto da {nome}"
+        fotos_recebidas = upload_resumivel(f"Enviar {alvo}", f"resumivel_{sufixo}", multiplas=multiplas)
+        if adicionar_fotos_resumiveis(fotos_recebidas, chave, unica=not multiplas):
+            st.rerun()
+
+    # Verificar fotos salvas na sessão
+    fotos_salvas = recuperar_fotos_session_state(chave)
+    if fotos_salvas and not fotos:
+        if multiplas:
+            st.markdown(f"<div class='info-box'>📁 {len(fotos_salvas)} foto(s) {nome} já salvas na sessão</div>",
+                        unsafe_allow_html=True)
+        else:
+            st.markdown(f"<div class='info-box'>📁 Foto da {nome} já salva na sessão</div>", unsafe_allow_html=True)
+    recuperadas = sum(foto.get('origem') == 'rascunho' for foto in fotos_salvas)
+    if recuperadas and st.button(f"🗑️ Descartar {recuperadas} foto(s) recuperada(s) do rascunho",
+                                 key=f"remover_rascunho_{chave}"):
+        remover_fotos_rascunho(chave)
+    mostrar_avisos_qualidade(fotos_salvas, rotulo, chave)
+
+    # Fotos novas ou removidas mudam o status da sessão e o botão de gerar
+    if set(st.session_state.get(chave, {})) != ids_anteriores:
+        st.rerun()
+
+@st.fragment(run_every=1)
+def acompanhar_tarefa(id_tarefa):
+    """Atualiza o progresso da tarefa sem bloquear a página; recarrega tudo quando ela termina"""
+    tarefa = gerenciador_padrao.obter(id_tarefa)
+    if tarefa is None or tarefa.finalizada:
+        st.rerun()
+    st.progress(tarefa.progresso, text=f"Gerando relatório... {tarefa.fotos_processadas}/{tarefa.total_fotos} foto(s)")
+    st.caption(f"🔖 Tarefa {id_tarefa[:8]} - se a conexão cair, recarregue a página para recuperar o relatório")
+
+def mostrar_tarefa(id_tarefa):
+    """Mostra o andamento ou o resultado da geração em segundo plano"""
+    tarefa = gerenciador_padrao.obter(id_tarefa)
+    if tarefa is None:
+        st.warning("⚠️ O relatório gerado anteriormente expirou. Gere novamente.")
+        st.session_state.pop('tarefa_id', None)
+        st.query_params.pop('tarefa', None)
+    elif not tarefa.finalizada:
+        acompanhar_tarefa(id_tarefa)
+    elif tarefa.estado == CONCLUIDA:
+        lote = tarefa.caminho_resultado is not None
+        st.success("✅ Relatórios gerados com sucesso!" if lote else "✅ Relatório gerado com sucesso!")
+        for site_id, erro in tarefa.falhas:
+            st.warning(f"⚠️ {site_id} ficou fora do .zip: {erro}")
+        if lote:
+            # O .zip só é lido do disco quando o usuário clica
+            downloads = [("📥 Baixar Relatórios (.zip)", tarefa.nome_arquivo, tarefa.mime, tarefa.ler_resultado,
+                          tarefa.tamanho_resultado)]
+        else:
+            downloads = [(f"📥 Baixar Relatório ({os.path.splitext(nome)[1]})", nome, mime, dados, len(dados))
+                         for nome, mime, dados in tarefa.arquivos]
+        for rotulo, nome, mime, dados, tamanho in downloads:
+            # Conta os bytes quando o usuário pede o arquivo, não quando o botão aparece
+            st.download_button(
+                rotulo,
+                dados,
+                file_name=nome,
+                mime=mime,
+                on_click=contar_bytes,
+                args=("download", tamanho),
+                type="primary",
+                use_container_width=True
+            )
+    else:
+        st.error(f"❌ Erro ao gerar relatório: {tarefa.erro}")
+        st.info("💡 Tente recarregar a página e fazer upload das fotos novamente")
+
+def formatos_escolhidos():
+    """Formatos marcados na escolha de formato (Word por padrão)"""
+    return OPCOES_FORMATO.get(st.session_state.get('formato_relatorio'), ("docx",))
+
+def secao_gerar():
+    """Botões de gerar e limpar, com o andamento da tarefa em segundo plano"""
+    # Relatório em andamento ou já gerado (também recupera pelo link após reconectar)
+    if 'tarefa_id' not in st.session_state and st.query_params.get('tarefa'):
+        st.session_state.tarefa_id = st.query_params['tarefa']
+    if st.session_state.get('tarefa_id'):
+        mostrar_tarefa(st.session_state.tarefa_id)
+
+    # Vale também para o lote de sites
+    st.radio("Formato", list(OPCOES_FORMATO), key='formato_relatorio', horizontal=True,
+             help="PDF é gerado aqui mesmo, sem precisar converter o .docx no celular")
+
+    # Verificar se tem dados suficientes
+    tem_dados_basicos = st.session_state.site_id and st.session_state.localizacao
+    fotos_antes_salvas = recuperar_fotos_session_state('fotos_antes_data')
+    fotos_depois_salvas = recuperar_fotos_session_state('fotos_depois_data')
+    foto_placa_salva = recuperar_fotos_session_state('foto_placa_data')
+    tem_fotos = fotos_antes_salvas or fotos_depois_salvas or foto_placa_salva
+
+    if not tem_dados_basicos:
+        st.warning("⚠️ Preencha os campos Site ID e Localização primeiro")
+    elif not tem_fotos:
+        st.warning("⚠️ Faça upload de pelo menos uma foto")
+    else:
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            if st.button("🚀 Gerar Relatório", type="primary", use_container_width=True):
+                # A geração roda em segundo plano; a página só acompanha o progresso
+                id_tarefa = gerenciador_padrao.enviar(
+                    st.session_state.site_id,
+                    st.session_state.data_execucao,
+                    st.session_state.localizacao,
+                    fotos_antes_salvas,
+                    fotos_depois_salvas,
+                    foto_placa_salva[0] if foto_placa_salva else None,
+                    sessao=st.session_state.rascunho_token,
+                    formatos=formatos_escolhidos()
+                )
+                st.session_state.tarefa_id = id_tarefa
+                st.query_params['tarefa'] = id_tarefa
+                st.rerun()
+
+        with col2:
+            if st.button("🗑️ Limpar", help="Limpar todos os dados"):
+                # Limpar session state
+                armazem_rascunhos.apagar(st.session_state.rascunho_token)
+                for key in ['tarefa_id', 'rascunho_campos', 'rascunho_fotos_antes_data',
+                            'rascunho_fotos_depois_data', 'rascunho_foto_placa_data']:
+                    if key in st.session_state:
+                        del st.session_state[key]
+                st.query_params.pop('tarefa', None)
+                limpar_site_atual()
+                st.rerun()
+
+def site_atual():
+    """O site em edição no formato de um item do lote"""
+    foto_placa = recuperar_fotos_session_state('foto_placa_data')
+    return {
+        'site_id': st.session_state.site_id,
+        'data_execucao': st.session_state.data_execucao,
+        'localizacao': st.session_state.localizacao,
+        'fotos_antes': recuperar_fotos_session_state('fotos_antes_data'),
+        'fotos_depois': recuperar_fotos_session_state('fotos_depois_data'),
+        'foto_placa': foto_placa[0] if foto_placa else None,
+    }
+
+def secao_lote():
+    """Vários sites num único .zip: o site preenchido entra no lote e o formulário fica livre para o próximo"""
+    lote = st.session_state.setdefault('lote_sites', [])
+    st.caption("Preencha um site, adicione ao lote e repita. No fim, todos os relatórios são gerados em paralelo "
+               "e baixados num único .zip.")
+    site = site_atual()
+    pronto = site['site_id'] and site['localizacao'] and total_fotos_site(
+        site['fotos_antes'], site['fotos_depois'], site['foto_placa'])
+    if st.button("➕ Adicionar este site ao lote", disabled=not pronto, use_container_width=True):
+        lote.append(site)
+        limpar_site_atual()
+        st.rerun()
+
+    for i, item in enumerate(lote):
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            fotos = total_fotos_site(item['fotos_antes'], item['fotos_depois'], item['foto_placa'])
+            st.write(f"📍 {item['site_id']} - {item['data_execucao'].strftime('%d/%m/%Y')} - "
+                     f"{item['localizacao']} ({fotos} foto(s))")
+        with col2:
+            if st.button("🗑️", key=f"remover_lote_{i}", help="Remover do lote"):
+                lote.pop(i)
+                st.rerun()
+
+    if lote:
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            if st.button(f"📦 Gerar .zip com {len(lote)} relatório(s)", type="primary", use_container_width=True):
+                id_tarefa = gerenciador_padrao.enviar_lote(lote, sessao=st.session_state.rascunho_token,
+                                                           formatos=formatos_escolhidos())
+                st.session_state.tarefa_id = id_tarefa
+                st.query_params['tarefa'] = id_tarefa
+                st.rerun()
+        with col2:
+            if st.button("Esvaziar lote"):
+                lote.clear()
+                st.rerun()
+
+@st.fragment
+def painel_lateral():
+    """Status da sessão, do cache e do pool; o checkbox de tempos só reexecuta o painel"""
+    st.header("📊 Status da Sessão")
+
+    # Indicador de conexão
+    st.markdown("🟢 **Aplicação Online**")
+    st.markdown(f"🕐 **{datetime.now().strftime('%H:%M:%S')}**")
+
+    st.divider()
+
+    st.subheader("📝 Dados do Formulário")
+    st.write(f"🆔 Site ID: {'✅' if st.session_state.site_id else '❌'}")
+    st.write(f"📍 Localização: {'✅' if st.session_state.localizacao else '❌'}")
+    st.write(f"📅 Data: {st.session_state.data_execucao.strftime('%d/%m/%Y')}")
+
+    st.subheader("📸 Fotos na Sessão")
+    fotos_antes_count = len(st.session_state.get('fotos_antes_data', {}))
+    fotos_depois_count = len(st.session_state.get('fotos_depois_data', {}))
+    foto_placa_count = len(st.session_state.get('foto_placa_data', {}))
+
+    st.write(f"🔴 Antes: {fotos_antes_count}")
+    st.write(f"🟢 Depois: {fotos_depois_count}")
+    st.write(f"🏷️ Placa: {foto_placa_count}")
+
+    total_fotos = fotos_antes_count + fotos_depois_count + foto_placa_count
+    st.metric("📊 Total", total_fotos)
+    if st.session_state.get('lote_sites'):
+        st.write(f"📦 Sites no lote: {len(st.session_state.lote_sites)}")
+
+    memoria_guardada, memoria_original, memoria_duplicada = memoria_fotos_sessao()
+    st.write(f"💾 Memória: {memoria_guardada / 1024 / 1024:.1f} MB")
+    if memoria_original > memoria_guardada:
+        from processamento_imagens import LADO_MAX_UPLOAD_PADRAO
+
+        if LADO_MAX_UPLOAD_PADRAO:
+            st.caption(f"Fotos compactadas para até {LADO_MAX_UPLOAD_PADRAO}px "
+                       f"(originais: {memoria_original / 1024 / 1024:.1f} MB)")
+    if memoria_duplicada:
+        st.caption(f"♻️ Fotos repetidas guardadas uma vez só: {memoria_duplicada / 1024 / 1024:.1f} MB poupados")
+    stats_blobs = armazem_rascunhos.estatisticas()
+    if stats_blobs['bytes_poupados']:
+        st.caption(f"♻️ Rascunhos no servidor: {stats_blobs['bytes_poupados'] / 1024 / 1024:.1f} MB "
+                   f"poupados pela deduplicação")
+
+    tem_dados_basicos = st.session_state.site_id and st.session_state.localizacao
+    if tem_dados_basicos and total_fotos > 0:
+        st.success("✅ Pronto!")
+    elif not tem_dados_basicos:
+        st.warning("⚠️ Faltam dados")
+    else:
+        st.info("ℹ️ Aguardando fotos")
+
+    st.subheader("⚡ Cache de Imagens")
+    stats_cache = cache_padrao.estatisticas()
+    st.write(f"✅ Acertos: {stats_cache['acertos']}")
+    st.write(f"🔄 Processadas: {stats_cache['falhas']}")
+    st.caption(f"{stats_cache['itens']} imagem(ns) em cache - {stats_cache['bytes'] / 1024 / 1024:.1f} MB")
+    if cache_padrao.pasta:
+        st.caption(f"Em disco: {stats_cache['bytes_em_disco'] / 1024 / 1024:.1f} MB")
+
+    if pool_compartilhado.ativo:
+        st.subheader("🏭 Processamento")
+        stats_pool = pool_compartilhado.estatisticas()
+        st.write(f"⚙️ Ocupados: {stats_pool['em_execucao']}/{stats_pool['workers']}")
+        st.write(f"⏳ Na fila: {stats_pool['fila']} ({stats_pool['sessoes_na_fila']} sessão(ões))")
+        st.caption(f"Utilização: {stats_pool['utilizacao']:.0%} - "
+                   f"{stats_pool['concluidos']} trabalho(s) concluído(s)")
+
+    if st.checkbox("⏱️ Mostrar tempos do relatório", key="mostrar_tempos"):
+        tarefa_atual = gerenciador_padrao.obter(st.session_state.get('tarefa_id', ''))
+        if tarefa_atual is not None and tarefa_atual.detalhamento:
+            for etapa, segundos in tarefa_atual.detalhamento['tempos'].items():
+                st.write(f"{etapa}: {segundos * 1000:.0f} ms")
+            for tipo, quantidade in tarefa_atual.detalhamento['bytes'].items():
+                st.caption(f"{tipo}: {quantidade / 1024:.0f} KB")
+        else:
+            st.caption("Gere um relatório para ver o detalhamento")
+        with st.expander("Percentis do servidor"):
+            for etapa, valores in registro_padrao.resumo().items():
+                st.caption(f"{etapa}: p50 {valores['p50'] * 1000:.0f} ms · p95 {valores['p95'] * 1000:.0f} ms · "
+                           f"p99 {valores['p99'] * 1000:.0f} ms ({valores['total']}x)")
@@ -0,0 +1,107 @@
+"""Disposição das fotos no relatório: grade em tabela, legenda e proporção preservada.
+
+Cada bloco de fotos vira uma tabela com largura fixa de colunas (o Word não precisa
+recalcular o ajuste automático) em vez de um parágrafo com centenas de imagens na
+mesma linha. Antes de reduzir qualquer foto, o layout lê só o cabeçalho de cada uma
+e calcula o tamanho final na página, para que a redução já gere os pixels certos.
+A largura da página (papel menos margens) vem do modelo do .docx (ver modelo_docx).
+
+Configuração por variável de ambiente:
+    RELATORIO_COLUNAS         fotos por linha da tabela (padrão 3)
+    RELATORIO_ALTURA_FOTO_CM  altura máxima de cada foto (padrão 5)
+    RELATORIO_LEGENDAS        0 para não colocar legenda embaixo das fotos
+"""
+import io
+import os
+from xml.sax.saxutils import escape
+
+from modelo_docx import TWIPS_POR_CM, carregar_modelo
+from processamento_imagens import encaixar, extrair_bytes, ler_dimensoes
+
+COLUNAS_PADRAO = int(os.environ.get("RELATORIO_COLUNAS", "3"))
+ALTURA_MAX_FOTO_CM = float(os.environ.get("RELATORIO_ALTURA_FOTO_CM", "5"))
+LEGENDAS_PADRAO = os.environ.get("RELATORIO_LEGENDAS", "1") != "0"
+# Folga horizontal de cada célula (margens internas da tabela)
+FOLGA_CELULA_CM = 0.4
+
+
+class Layout:
+    """Grade de fotos: quantas colunas, tamanho máximo de cada foto e se leva legenda"""
+
+    def __init__(self, colunas=None, altura_max_cm=None, legendas=None, largura_util_cm=None):
+        self.colunas = max(1, colunas or COLUNAS_PADRAO)
+        self.altura_max_cm = altura_max_cm or ALTURA_MAX_FOTO_CM
+        self.legendas = LEGENDAS_PADRAO if legendas is None else legendas
+        self._largura_util_cm = largura_util_cm
+
+    @property
+    def largura_util_cm(self):
+        """Largura informada ou, sem ela, a da página do modelo do .docx (RELATORIO_MODELO_DOCX)"""
+        return self._largura_util_cm or carregar_modelo().largura_util_cm
+
+    @property
+    def largura_coluna_cm(self):
+        return self.largura_util_cm / self.colunas
+
+    @property
+    def moldura_cm(self):
+        """Espaço máximo (largura, altura) de uma foto dentro da célula"""
+        return self.largura_coluna_cm - FOLGA_CELULA_CM, self.altura_max_cm
+
+    def planejar(self, imagens_data):
+        """Tamanho final na página (largura_cm, altura_cm) e legenda de cada foto, lendo só os cabeçalhos"""
+        largura_max, altura_max = self.moldura_cm
+        planejadas = []
+        for numero, imagem in enumerate(imagens_data, start=1):
+            largura, altura = ler_dimensoes(io.BytesIO(extrair_bytes(imagem)))
+            largura_cm, altura_cm = encaixar(largura, altura, largura_max, altura_max)
+            planejadas.append((largura_cm, altura_cm, legenda_foto(imagem, numero) if self.legendas else None))
+        return planejadas
+
+    def linhas(self, itens):
+        """Divide os itens em linhas da tabela"""
+        itens = list(itens)
+        return [itens[i:i + self.colunas] for i in range(0, len(itens), self.colunas)]
+
+
+def legenda_foto(imagem, numero):
+    """Legenda informada na própria foto (session state) ou "Foto N" na ordem do bloco"""
+    if isinstance(imagem, dict) and imagem.get('legenda'):
+        return imagem['legenda']
+    return f"Foto {numero}"
+
+
+def tabela_xml(layout, celulas, estilo_legenda="Caption"):
+    """XML (WordprocessingML) da tabela de fotos, usado pelo escritor do .docx (docx_streaming).
+
+    `celulas` são pares (XML do run com a imagem, legenda ou None), na ordem da grade.
+    `estilo_legenda` é o ID do estilo de legenda no modelo do documento.
+    """
+    largura_twips = int(layout.largura_coluna_cm * TWIPS_POR_CM)
+    grade = "".join(f'<w:gridCol w:w="{largura_twips}"/>' for _ in range(layout.colunas))
+    linhas = []
+    for linha in layout.linhas(celulas):
+        colunas = []
+        for run_imagem, legenda in linha:
+            conteudo = f'<w:p><w:pPr><w:jc w:val="center"/></w:pPr>{run_imagem}</w:p>'
+            if legenda:
+                conteudo += (
+                    f'<w:p><w:pPr><w:pStyle w:val="{estilo_legenda}"/><w:jc w:val="center"/></w:pPr>'
+                    f'<w:r><w:t xml:space="preserve">{escape(legenda)}</w:t></w:r></w:p>'
+                )
+            colunas.append(_celula_xml(largura_twips, conteudo))
+        # Células vazias completam a última linha (toda célula precisa de um parágrafo)
+        colunas += [_celula_xml(largura_twips, "<w:p/>")] * (layout.colunas - len(linha))
+        linhas.append(f'<w:tr>{"".join(colunas)}</w:tr>')
+    return (
+        '<w:tbl><w:tblPr><w:tblW w:w="0" w:type="auto"/><w:jc w:val="center"/>'
+        f'<w:tblLayout w:type="fixed"/></w:tblPr><w:tblGrid>{grade}</w:tblGrid>{"".join(linhas)}</w:tbl>'
+    )
+
+
+def _celula_xml(largura_twips, conteudo):
+    return f'<w:tc><w:tcPr><w:tcW w:w="{largura_twips}" w:type="dxa"/></w:tcPr>{conteudo}</w:tc>'
+
+
+# Layout configurado pelas variáveis de ambiente
+layout_padrao = Layout()
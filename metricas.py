@@ -0,0 +1,231 @@
+"""Instrumentação das etapas da geração do relatório.
+
+Cada etapa medida alimenta um histograma global (exposto no formato texto do
+Prometheus, com p50/p95/p99) e, se houver um relatório sendo coletado no contexto
+atual, o detalhamento de tempos daquele relatório. As etapas por imagem somam o
+tempo de todas as threads. Nos processos do pool compartilhado as medições são
+gravadas como amostras e reproduzidas no processo do app (gravar_amostras /
+reproduzir_amostras); nos demais pools de processos elas não entram nas métricas.
+Medidores (valores instantâneos, como a fila do pool) são lidos na hora da coleta.
+
+Exposição opcional, por variável de ambiente:
+    RELATORIO_METRICAS_PORTA    sobe um servidor HTTP com /metrics nessa porta
+    RELATORIO_METRICAS_ARQUIVO  regrava esse arquivo com as métricas a cada relatório
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+AMOSTRAS_PERCENTIS = 1000
+PERCENTIS = (0.5, 0.95, 0.99)
+
+PORTA_METRICAS = int(os.environ.get("RELATORIO_METRICAS_PORTA", "0"))
+ARQUIVO_METRICAS = os.environ.get("RELATORIO_METRICAS_ARQUIVO", "")
+
+_coletor_atual = contextvars.ContextVar("coletor_relatorio", default=None)
+_amostras_atual = contextvars.ContextVar("amostras_processo", default=None)
+# O mesmo coletor recebe medições das threads do pool de imagens
+_lock_coletores = threading.Lock()
+
+
+class Histograma:
+    """Histograma cumulativo + janela das últimas amostras para os percentis"""
+
+    def __init__(self):
+        self.contagens = [0] * len(LIMITES_SEGUNDOS)
+        self.total = 0
+        self.soma = 0.0
+        self.amostras = deque(maxlen=AMOSTRAS_PERCENTIS)
+
+    def observar(self, valor):
+        for i, limite in enumerate(LIMITES_SEGUNDOS):
+            if valor <= limite:
+                self.contagens[i] += 1
+        self.total += 1
+        self.soma += valor
+        self.amostras.append(valor)
+
+    def percentil(self, p):
+        if not self.amostras:
+            return 0.0
+        ordenadas = sorted(self.amostras)
+        return ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))]
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self.histogramas = {}
+        self.bytes = {}
+        self.relatorios = 0
+        self.medidores = {}
+        self._lock = threading.Lock()
+
+    def observar(self, etapa, segundos):
+        with self._lock:
+            self.histogramas.setdefault(etapa, Histograma()).observar(segundos)
+
+    def contar_bytes(self, tipo, quantidade):
+        with self._lock:
+            self.bytes[tipo] = self.bytes.get(tipo, 0) + quantidade
+
+    def registrar_medidor(self, nome, ajuda, funcao):
+        """Medidor (gauge) calculado por `funcao()` a cada coleta"""
+        with self._lock:
+            self.medidores[nome] = (ajuda, funcao)
+
+    def texto_prometheus(self):
+        """Métricas no formato de exposição em texto do Prometheus"""
+        linhas = [
+            "# HELP relatorio_etapa_segundos Duração das etapas da geração do relatório",
+            "# TYPE relatorio_etapa_segundos histogram",
+        ]
+        with self._lock:
+            for etapa, h in sorted(self.histogramas.items()):
+                for limite, contagem in zip(LIMITES_SEGUNDOS, h.contagens):
+                    linhas.append(f'relatorio_etapa_segundos_bucket{{etapa="{etapa}",le="{limite}"}} {contagem}')
+                linhas.append(f'relatorio_etapa_segundos_bucket{{etapa="{etapa}",le="+Inf"}} {h.total}')
+                linhas.append(f'relatorio_etapa_segundos_sum{{etapa="{etapa}"}} {h.soma:.6f}')
+                linhas.append(f'relatorio_etapa_segundos_count{{etapa="{etapa}"}} {h.total}')
+            linhas += [
+                "# HELP relatorio_etapa_percentil_segundos Percentis das últimas execuções de cada etapa",
+                "# TYPE relatorio_etapa_percentil_segundos summary",
+            ]
+            for etapa, h in sorted(self.histogramas.items()):
+                for p in PERCENTIS:
+                    linhas.append(
+                        f'relatorio_etapa_percentil_segundos{{etapa="{etapa}",quantile="{p}"}} {h.percentil(p):.6f}'
+                    )
+            linhas += ["# HELP relatorio_bytes_total Bytes processados por tipo", "# TYPE relatorio_bytes_total counter"]
+            for tipo, quantidade in sorted(self.bytes.items()):
+                linhas.append(f'relatorio_bytes_total{{tipo="{tipo}"}} {quantidade}')
+            linhas += ["# TYPE relatorio_gerados_total counter", f"relatorio_gerados_total {self.relatorios}"]
+            medidores = sorted(self.medidores.items())
+        for nome, (ajuda, funcao) in medidores:
+            linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} gauge", f"{nome} {funcao()}"]
+        return "\n".join(linhas) + "\n"
+
+    def resumo(self):
+        """Percentis por etapa, para exibir na tela"""
+        with self._lock:
+            return {
+                etapa: {'p50': h.percentil(0.5), 'p95': h.percentil(0.95), 'p99': h.percentil(0.99), 'total': h.total}
+                for etapa, h in sorted(self.histogramas.items())
+            }
+
+
+registro_padrao = RegistroMetricas()
+
+
+@contextmanager
+def medir(etapa):
+    """Mede a duração do bloco e registra na etapa informada"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _registrar_tempo(etapa, time.perf_counter() - inicio)
+
+
+def _registrar_tempo(etapa, duracao):
+    registro_padrao.observar(etapa, duracao)
+    amostras = _amostras_atual.get()
+    if amostras is not None:
+        amostras.append(("tempo", etapa, duracao))
+    coletor = _coletor_atual.get()
+    if coletor is not None:
+        with _lock_coletores:
+            coletor['tempos'][etapa] = coletor['tempos'].get(etapa, 0.0) + duracao
+
+
+def contar_bytes(tipo, quantidade):
+    registro_padrao.contar_bytes(tipo, quantidade)
+    amostras = _amostras_atual.get()
+    if amostras is not None:
+        amostras.append(("bytes", tipo, quantidade))
+    coletor = _coletor_atual.get()
+    if coletor is not None:
+        with _lock_coletores:
+            coletor['bytes'][tipo] = coletor['bytes'].get(tipo, 0) + quantidade
+
+
+@contextmanager
+def coletar_relatorio():
+    """Coleta o detalhamento de tempos e bytes das etapas executadas nesta thread"""
+    coletor = {'tempos': {}, 'bytes': {}}
+    token = _coletor_atual.set(coletor)
+    try:
+        yield coletor
+    finally:
+        _coletor_atual.reset(token)
+        with registro_padrao._lock:
+            registro_padrao.relatorios += 1
+        if ARQUIVO_METRICAS:
+            gravar_arquivo(ARQUIVO_METRICAS)
+
+
+@contextmanager
+def gravar_amostras():
+    """Guarda numa lista as medições feitas no bloco, para enviar a outro processo"""
+    amostras = []
+    token = _amostras_atual.set(amostras)
+    try:
+        yield amostras
+    finally:
+        _amostras_atual.reset(token)
+
+
+def reproduzir_amostras(amostras):
+    """Registra aqui (e no relatório sendo coletado) as medições feitas em outro processo"""
+    for tipo, nome, valor in amostras:
+        if tipo == "tempo":
+            _registrar_tempo(nome, valor)
+        else:
+            contar_bytes(nome, valor)
+
+
+def gravar_arquivo(caminho):
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        arquivo.write(registro_padrao.texto_prometheus())
+    os.replace(temporario, caminho)
+
+
+class _HandlerMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        corpo = registro_padrao.texto_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+_servidor = None
+_lock_servidor = threading.Lock()
+
+
+def iniciar_servidor(porta=None):
+    """Sobe (uma vez por processo) o endpoint /metrics numa thread em segundo plano"""
+    global _servidor
+    porta = porta or PORTA_METRICAS
+    with _lock_servidor:
+        if _servidor is not None or not porta:
+            return _servidor
+        try:
+            _servidor = ThreadingHTTPServer(("0.0.0.0", porta), _HandlerMetricas)
+        except OSError:
+            # Porta ocupada (por exemplo, outro processo do app já expõe as métricas)
+            return None
+        threading.Thread(target=_servidor.serve_forever, daemon=True, name="metricas").start()
+        return _servidor
@@ -0,0 +1,259 @@
+"""Modelo .docx do relatório: papel timbrado, estilos e campos a preencher.
+
+O modelo é lido e preparado uma vez (e de novo só se o arquivo mudar): as partes
+que não mudam (estilos, tema, cabeçalho e rodapé com o timbrado, logotipo) são
+guardadas como bytes, e o XML com campos é quebrado em trechos fixos e nomes de
+campo. Cada relatório só junta os trechos com os valores e insere as fotos.
+
+Campos aceitos no corpo, no cabeçalho e no rodapé do modelo:
+    {{site_id}}  {{data_execucao}}  {{localizacao}}
+e um parágrafo só com {{fotos}}, onde entram os blocos ANTES, DEPOIS e PLACA
+(sem ele, as fotos vão para o final do documento).
+
+As fotos ocupam a largura útil da seção onde fica {{fotos}} (tamanho do papel
+menos as margens, lidos do modelo), então um timbrado em A4 ou com outras
+margens recebe tabelas do tamanho certo; o PDF usa a mesma página.
+
+Para criar um modelo da empresa: `python modelo_docx.py modelo.docx` grava o
+modelo padrão; abra no Word, coloque o timbrado e ajuste os estilos.
+
+Configuração por variável de ambiente:
+    RELATORIO_MODELO_DOCX  caminho do .docx base (padrão: o modelo embutido, sem timbrado)
+"""
+import importlib.util
+import os
+import re
+import sys
+import threading
+import zipfile
+from xml.sax.saxutils import escape
+
+# O python-docx não é importado: do pacote só se usa o arquivo do modelo padrão
+CAMINHO_MODELO_BASE = os.path.join(
+    os.path.dirname(importlib.util.find_spec("docx").origin), "templates", "default.docx"
+)
+CAMINHO_MODELO_EMPRESA = os.environ.get("RELATORIO_MODELO_DOCX", "")
+
+NAMESPACES = {
+    "w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "wp": "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing",
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "pic": "http://schemas.openxmlformats.org/drawingml/2006/picture",
+}
+_SECAO = (
+    '<w:sectPr><w:pgSz w:w="12240" w:h="15840"/>'
+    '<w:pgMar w:top="1440" w:right="1800" w:bottom="1440" w:left="1800" w:header="720" w:footer="720" w:gutter="0"/>'
+    '<w:cols w:space="720"/><w:docGrid w:linePitch="360"/></w:sectPr>'
+)
+_PARTES_GERADAS = {"word/document.xml", "word/_rels/document.xml.rels", "[Content_Types].xml"}
+_TIPOS_IMAGEM = {"jpeg": "image/jpeg", "png": "image/png"}
+# Estilos usados pelo relatório, pelo nome interno do Word (o ID muda com o idioma do Word que salvou o modelo)
+_NOMES_ESTILOS = {"Heading1": "heading 1", "Heading2": "heading 2", "Caption": "caption"}
+
+TWIPS_POR_CM = 1440 / 2.54
+# Página Carta com as margens do modelo embutido, em twips; vale para o que faltar no sectPr do modelo
+_PAGINA_PADRAO = {"largura": 12240, "altura": 15840, "esquerda": 1800, "direita": 1800, "topo": 1440, "base": 1440,
+                  "medianiz": 0}
+_ATRIBUTOS_PAGINA = {
+    "largura": ("pgSz", "w"), "altura": ("pgSz", "h"), "esquerda": ("pgMar", "(?:left|start)"),
+    "direita": ("pgMar", "(?:right|end)"), "topo": ("pgMar", "top"), "base": ("pgMar", "bottom"),
+    "medianiz": ("pgMar", "gutter"),
+}
+
+_CAMPO = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+_PARAGRAFO = re.compile(r"<w:p[ >].*?</w:p>", re.S)
+_TEXTO = re.compile(r"(<w:t(?:\s[^>]*)?>)([^<]*)(</w:t>)")
+_PARAGRAFO_FOTOS = re.compile(r"<w:p[ >](?:(?!<w:p[ >]).)*?\{\{\s*fotos\s*\}\}.*?</w:p>", re.S)
+
+
+def paragrafo_xml(texto, estilo=None):
+    estilo_xml = f'<w:pPr><w:pStyle w:val="{estilo}"/></w:pPr>' if estilo else ''
+    return f'<w:p>{estilo_xml}<w:r><w:t xml:space="preserve">{escape(texto)}</w:t></w:r></w:p>'
+
+
+def _documento_padrao():
+    """Corpo do modelo embutido: o mesmo cabeçalho do relatório, com os campos"""
+    corpo = (
+        paragrafo_xml("RELATÓRIO FOTOGRÁFICO DE ZELADORIA", "Heading1")
+        + paragrafo_xml("Site ID: {{site_id}}")
+        + paragrafo_xml("Data da Execução: {{data_execucao}}")
+        + paragrafo_xml("Localização: {{localizacao}}")
+        + paragrafo_xml("{{fotos}}")
+    )
+    declaracoes = " ".join(f'xmlns:{prefixo}="{uri}"' for prefixo, uri in NAMESPACES.items())
+    return (
+        "<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n"
+        f"<w:document {declaracoes}><w:body>{corpo}{_SECAO}</w:body></w:document>"
+    ).encode("utf-8")
+
+
+def _juntar_campos_divididos(xml):
+    """O Word costuma quebrar "{{site_id}}" em vários runs; junta o texto desses parágrafos no primeiro run"""
+
+    def juntar(paragrafo):
+        xml_paragrafo = paragrafo.group(0)
+        textos = _TEXTO.findall(xml_paragrafo)
+        completo = "".join(texto for _, texto, _ in textos)
+        campos = _CAMPO.findall(completo)
+        if not campos or len(_CAMPO.findall("".join(f"\0{texto}" for _, texto, _ in textos))) == len(campos):
+            return xml_paragrafo
+        contador = iter(range(len(textos)))
+
+        def substituir(_):
+            primeiro = next(contador) == 0
+            return f'<w:t xml:space="preserve">{completo}</w:t>' if primeiro else "<w:t></w:t>"
+
+        return _TEXTO.sub(substituir, xml_paragrafo)
+
+    return _PARAGRAFO.sub(juntar, xml)
+
+
+def _declarar_namespaces(xml):
+    """Garante no elemento raiz os prefixos usados no XML das fotos"""
+    inicio = xml.index("<w:document")
+    fim = xml.index(">", inicio)
+    raiz = xml[inicio:fim]
+    faltando = "".join(f' xmlns:{p}="{uri}"' for p, uri in NAMESPACES.items() if f"xmlns:{p}=" not in raiz)
+    return xml[:fim] + faltando + xml[fim:]
+
+
+def _medidas_pagina(secao_xml):
+    """Tamanho do papel e margens (em twips) de um sectPr"""
+    pagina = dict(_PAGINA_PADRAO)
+    for medida, (elemento, atributo) in _ATRIBUTOS_PAGINA.items():
+        valor = re.search(rf'<w:{elemento}\b[^>]*\bw:{atributo}="(-?\d+)"', secao_xml)
+        if valor:
+            # Margem negativa (texto pode invadir o cabeçalho) tem o mesmo tamanho para as fotos
+            pagina[medida] = abs(int(valor.group(1)))
+    return pagina
+
+
+def _mapear_estilos(estilos_xml):
+    ids = {}
+    for estilo in re.finditer(r'<w:style\b[^>]*w:styleId="([^"]+)"[^>]*>(.*?)</w:style>', estilos_xml, re.S):
+        nome = re.search(r'<w:name w:val="([^"]+)"', estilo.group(2))
+        if nome:
+            ids[nome.group(1).lower()] = estilo.group(1)
+    return {estilo: ids.get(nome, estilo) for estilo, nome in _NOMES_ESTILOS.items()}
+
+
+class ModeloDocx:
+    """Modelo já preparado: partes fixas em bytes e partes com campos em trechos"""
+
+    def __init__(self, partes):
+        documento = partes["word/document.xml"].decode("utf-8")
+        documento = _declarar_namespaces(_juntar_campos_divididos(documento))
+        paragrafo_fotos = _PARAGRAFO_FOTOS.search(documento)
+        if paragrafo_fotos:
+            documento = documento[:paragrafo_fotos.start()] + "{{fotos}}" + documento[paragrafo_fotos.end():]
+        else:
+            # Sem o marcador, as fotos entram no fim do corpo, antes das configurações da seção
+            fim_corpo = documento.rindex("</w:body>")
+            secao = documento.rfind("<w:sectPr", 0, fim_corpo)
+            posicao = secao if secao != -1 else fim_corpo
+            documento = documento[:posicao] + "{{fotos}}" + documento[posicao:]
+        # A seção das fotos termina no primeiro sectPr depois delas (o do corpo, na última seção)
+        secao = documento.find("<w:sectPr", documento.index("{{fotos}}"))
+        self.pagina = _medidas_pagina(documento[secao:documento.find("</w:sectPr>", secao)] if secao != -1 else "")
+
+        self.partes = {}
+        self._com_campos = {"word/document.xml": _CAMPO.split(documento)}
+        for nome, conteudo in partes.items():
+            if nome in _PARTES_GERADAS:
+                continue
+            if re.fullmatch(r"word/(header|footer)\d*\.xml", nome) and b"{{" in conteudo:
+                self._com_campos[nome] = _CAMPO.split(_juntar_campos_divididos(conteudo.decode("utf-8")))
+            else:
+                self.partes[nome] = conteudo
+
+        self._relacoes = partes["word/_rels/document.xml.rels"].decode("utf-8")
+        self._tipos = partes["[Content_Types].xml"].decode("utf-8")
+        self.estilos = _mapear_estilos(partes.get("word/styles.xml", b"").decode("utf-8"))
+        # Os desenhos do relatório não podem repetir o ID de uma imagem do timbrado
+        ids_desenho = [int(i) for conteudo in partes.values() if b"docPr" in conteudo
+                       for i in re.findall(rb'<wp:docPr id="(\d+)"', conteudo)]
+        self.primeiro_id_desenho = max(ids_desenho, default=0) + 1
+
+    @classmethod
+    def ler(cls, caminho=None):
+        """Lê o modelo em `caminho` ou, sem caminho, o modelo embutido"""
+        with zipfile.ZipFile(caminho or CAMINHO_MODELO_BASE) as arquivo:
+            partes = {nome: arquivo.read(nome) for nome in arquivo.namelist()}
+        if not caminho:
+            partes["word/document.xml"] = _documento_padrao()
+        return cls(partes)
+
+    @property
+    def largura_util_cm(self):
+        """Largura entre as margens da página das fotos"""
+        pagina = self.pagina
+        return (pagina["largura"] - pagina["esquerda"] - pagina["direita"] - pagina["medianiz"]) / TWIPS_POR_CM
+
+    def estilo(self, nome):
+        """ID do estilo no modelo ("Heading2" pode ser "Ttulo2" num modelo salvo no Word em português)"""
+        return self.estilos.get(nome, nome)
+
+    def partes_preenchidas(self, campos, fotos_xml):
+        """Partes com campos, já com os valores; `fotos_xml` entra no lugar de {{fotos}}"""
+        valores = {nome: escape(str(valor)) for nome, valor in campos.items()}
+        valores["fotos"] = fotos_xml
+        preenchidas = {}
+        for nome, trechos in self._com_campos.items():
+            # Nos trechos, as posições ímpares são nomes de campo; campos desconhecidos ficam como estão
+            preenchidas[nome] = "".join(
+                trecho if i % 2 == 0 else valores.get(trecho, "{{" + trecho + "}}") for i, trecho in enumerate(trechos)
+            )
+        return preenchidas
+
+    def relacoes_xml(self, relacoes_imagens):
+        return self._relacoes.replace("</Relationships>", relacoes_imagens + "</Relationships>")
+
+    def tipos_xml(self, extensoes):
+        tipos = self._tipos
+        for extensao in sorted(extensoes):
+            if f'Extension="{extensao}"' not in tipos:
+                tipos = tipos.replace(
+                    "</Types>", f'<Default Extension="{extensao}" ContentType="{_TIPOS_IMAGEM[extensao]}"/></Types>'
+                )
+        return tipos
+
+
+def campos_relatorio(site_id, data_execucao, localizacao):
+    """Valores dos campos do modelo para um relatório"""
+    return {
+        "site_id": site_id,
+        "data_execucao": data_execucao.strftime('%d/%m/%Y'),
+        "localizacao": localizacao.upper(),
+    }
+
+
+_modelos = {}
+_lock = threading.Lock()
+
+
+def carregar_modelo(caminho=None):
+    """Modelo preparado, lido uma vez por processo e relido só se o arquivo for alterado"""
+    caminho = caminho or CAMINHO_MODELO_EMPRESA or None
+    versao = os.path.getmtime(caminho) if caminho else None
+    with _lock:
+        em_cache = _modelos.get(caminho)
+        if em_cache is None or em_cache[0] != versao:
+            _modelos[caminho] = (versao, ModeloDocx.ler(caminho))
+        return _modelos[caminho][1]
+
+
+def salvar_modelo_padrao(destino):
+    """Grava o modelo embutido como .docx, ponto de partida para o modelo da empresa"""
+    with zipfile.ZipFile(CAMINHO_MODELO_BASE) as base, \
+            zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as arquivo:
+        for nome in base.namelist():
+            arquivo.writestr(nome, _documento_padrao() if nome == "word/document.xml" else base.read(nome))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python modelo_docx.py modelo.docx", file=sys.stderr)
+        sys.exit(1)
+    salvar_modelo_padrao(sys.argv[1])
+    print(f"Modelo gravado em {sys.argv[1]}; defina RELATORIO_MODELO_DOCX com o caminho depois de editar")
@@ -0,0 +1,287 @@
+"""Relatório em PDF gerado direto, sem LibreOffice nem serviço externo.
+
+Mesmo conteúdo do .docx: cabeçalho (Site ID, data, localização) e os blocos de
+fotos em grade conforme o layout, com legenda. As fotos já reduzidas pelo
+pipeline entram no PDF como estão: o JPEG é gravado com o filtro DCTDecode,
+byte a byte, sem decodificar nem recomprimir. Só PNG (perfil "paleta") é
+decodificado, porque o PDF não lê PNG diretamente.
+
+A página (papel e margens) é a mesma do modelo do .docx (ver modelo_docx), então
+as fotos planejadas pelo layout cabem igual nos dois formatos.
+
+O arquivo é escrito em sequência: cada imagem é gravada assim que o bloco é
+desenhado, e a tabela de referências cruzadas vem no final.
+"""
+import hashlib
+import io
+import unicodedata
+import zlib
+
+from layout import layout_padrao
+from metricas import medir
+from modelo_docx import carregar_modelo
+
+PONTOS_POR_CM = 72 / 2.54
+PONTOS_POR_TWIP = 1 / 20
+FOLGA_CELULA = 4
+
+# (fonte, tamanho, cor RGB, espaço antes) de cada estilo, próximos aos do modelo do .docx
+_ESTILOS = {
+    'titulo1': ("F2", 16, (0.212, 0.373, 0.569), 12),
+    'titulo2': ("F2", 13, (0.310, 0.506, 0.741), 10),
+    'normal': ("F1", 11, (0, 0, 0), 0),
+    'legenda': ("F1", 9, (0.310, 0.506, 0.741), 2),
+}
+_FONTES = {"F1": "Helvetica", "F2": "Helvetica-Bold"}
+
+# Larguras da Helvetica (em milésimos do tamanho da fonte) de " " a "~"
+_LARGURAS = dict(zip(range(32, 127), [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]))
+
+
+def largura_texto(texto, tamanho, negrito=False):
+    """Largura aproximada do texto em pontos (letras acentuadas contam como a letra base)"""
+    total = 0
+    for caractere in texto:
+        base = unicodedata.normalize("NFD", caractere)[0]
+        total += _LARGURAS.get(ord(base), 556)
+    # A Helvetica-Bold é um pouco mais larga; a folga evita estourar a margem ao quebrar linhas
+    return total * tamanho / 1000 * (1.08 if negrito else 1)
+
+
+def quebrar_linhas(texto, largura_max, tamanho, negrito=False):
+    """Divide o texto em linhas que cabem em `largura_max` pontos, quebrando nos espaços"""
+    linhas, atual = [], ""
+    for palavra in texto.split(" "):
+        candidato = f"{atual} {palavra}" if atual else palavra
+        if atual and largura_texto(candidato, tamanho, negrito) > largura_max:
+            linhas.append(atual)
+            candidato = palavra
+        atual = candidato
+    linhas.append(atual)
+    return linhas
+
+
+def _texto_pdf(texto):
+    # Fontes padrão com WinAnsiEncoding: cp1252 cobre os acentos do português
+    dados = texto.encode("cp1252", "replace")
+    return b"(" + dados.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _numero(valor):
+    return f"{valor:.2f}".rstrip("0").rstrip(".")
+
+
+def descrever_imagem(dados):
+    """Dicionário e conteúdo do XObject de imagem: JPEG passa direto, PNG é descompactado para Flate"""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(dados)) as img:
+        if img.format == "JPEG":
+            espacos = {"L": "/DeviceGray", "RGB": "/DeviceRGB", "CMYK": "/DeviceCMYK"}
+            if img.mode not in espacos:
+                raise ValueError(f"JPEG em modo {img.mode} não suportado no PDF")
+            dicionario = (f"/Type /XObject /Subtype /Image /Width {img.width} /Height {img.height} "
+                          f"/ColorSpace {espacos[img.mode]} /BitsPerComponent 8 /Filter /DCTDecode")
+            # JPEG CMYK do Photoshop (Adobe) vem com os canais invertidos
+            if img.mode == "CMYK" and "adobe" in img.info:
+                dicionario += " /Decode [1 0 1 0 1 0 1 0]"
+            return dicionario, dados
+        convertida = img.convert("L" if img.mode in ("1", "L", "LA") else "RGB")
+        espaco = "/DeviceGray" if convertida.mode == "L" else "/DeviceRGB"
+        dicionario = (f"/Type /XObject /Subtype /Image /Width {img.width} /Height {img.height} "
+                      f"/ColorSpace {espaco} /BitsPerComponent 8 /Filter /FlateDecode")
+        return dicionario, zlib.compress(convertida.tobytes(), 6)
+
+
+class EscritorPdf:
+    """Escreve o PDF objeto a objeto, página por página"""
+
+    # Objetos com número fixo: catálogo, árvore de páginas e as duas fontes
+    _CATALOGO, _PAGINAS = 1, 2
+
+    def __init__(self, destino, pagina=None):
+        """`pagina`: papel e margens em twips, como ModeloDocx.pagina (padrão: a do modelo do .docx)"""
+        pagina = {medida: valor * PONTOS_POR_TWIP for medida, valor in (pagina or carregar_modelo().pagina).items()}
+        self._largura_pagina, self._altura_pagina = pagina["largura"], pagina["altura"]
+        self._esquerda = pagina["esquerda"] + pagina["medianiz"]
+        self._largura_util = self._largura_pagina - self._esquerda - pagina["direita"]
+        self._topo, self._base = self._altura_pagina - pagina["topo"], pagina["base"]
+        self._proprio = isinstance(destino, (str, bytes)) or hasattr(destino, "__fspath__")
+        self._arquivo = open(destino, "wb") if self._proprio else destino
+        self._posicao = 0
+        self._deslocamentos = {}
+        self._fontes = {}
+        self._proximo_objeto = self._PAGINAS + 1
+        self._paginas = []
+        self._por_hash = {}
+        self._gravar(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        for nome, fonte in _FONTES.items():
+            self._fontes[nome] = self._objeto(
+                f"<< /Type /Font /Subtype /Type1 /BaseFont /{fonte} /Encoding /WinAnsiEncoding >>".encode()
+            )
+        self._nova_pagina()
+
+    # --- baixo nível ---
+
+    def _gravar(self, dados):
+        self._arquivo.write(dados)
+        self._posicao += len(dados)
+
+    def _reservar(self):
+        numero = self._proximo_objeto
+        self._proximo_objeto += 1
+        return numero
+
+    def _objeto(self, corpo, numero=None):
+        numero = numero or self._reservar()
+        self._deslocamentos[numero] = self._posicao
+        self._gravar(f"{numero} 0 obj\n".encode() + corpo + b"\nendobj\n")
+        return numero
+
+    def _stream(self, dicionario, dados):
+        return self._objeto(f"<< {dicionario} /Length {len(dados)} >>\nstream\n".encode() + dados + b"\nendstream")
+
+    # --- páginas ---
+
+    def _nova_pagina(self):
+        self._conteudo = []
+        self._imagens_pagina = {}
+        self._y = self._topo
+
+    def _fechar_pagina(self):
+        conteudo = self._stream("/Filter /FlateDecode", zlib.compress("\n".join(self._conteudo).encode("latin-1")))
+        fontes = " ".join(f"/{nome} {numero} 0 R" for nome, numero in self._fontes.items())
+        imagens = " ".join(f"/{nome} {numero} 0 R" for nome, numero in self._imagens_pagina.items())
+        self._paginas.append(self._objeto(
+            f"<< /Type /Page /Parent {self._PAGINAS} 0 R "
+            f"/MediaBox [0 0 {_numero(self._largura_pagina)} {_numero(self._altura_pagina)}] "
+            f"/Resources << /Font << {fontes} >> /XObject << {imagens} >> >> /Contents {conteudo} 0 R >>".encode()
+        ))
+
+    def _garantir_espaco(self, altura):
+        """Passa para a próxima página se `altura` pontos não couberem na atual"""
+        if self._y - altura < self._base and self._y < self._topo:
+            self._fechar_pagina()
+            self._nova_pagina()
+
+    # --- conteúdo ---
+
+    def _linha_texto(self, texto, x, y, estilo):
+        fonte, tamanho, cor, _ = _ESTILOS[estilo]
+        r, g, b = cor
+        self._conteudo.append(
+            f"BT {_numero(r)} {_numero(g)} {_numero(b)} rg /{fonte} {tamanho} Tf {_numero(x)} {_numero(y)} Td "
+            + _texto_pdf(texto).decode("latin-1") + " Tj ET"
+        )
+
+    def _altura_paragrafo(self, texto, estilo):
+        fonte, tamanho, _, antes = _ESTILOS[estilo]
+        linhas = quebrar_linhas(texto, self._largura_util, tamanho, fonte == "F2")
+        return antes + len(linhas) * tamanho * 1.25 + 6
+
+    def paragrafo(self, texto, estilo="normal"):
+        fonte, tamanho, _, antes = _ESTILOS[estilo]
+        linhas = quebrar_linhas(texto, self._largura_util, tamanho, fonte == "F2")
+        self._garantir_espaco(self._altura_paragrafo(texto, estilo))
+        self._y -= antes
+        for linha in linhas:
+            self._y -= tamanho * 1.25
+            self._linha_texto(linha, self._esquerda, self._y + tamanho * 0.25, estilo)
+        self._y -= 6
+
+    def _gravar_imagem(self, dados):
+        # Imagens idênticas são gravadas uma vez só e reaproveitadas, como no .docx
+        digest = hashlib.sha1(dados).hexdigest()
+        if digest not in self._por_hash:
+            self._por_hash[digest] = self._stream(*descrever_imagem(dados))
+        return self._por_hash[digest]
+
+    def bloco_imagens(self, titulo, imagens_data, imagens_reduzidas, layout=None):
+        """Equivalente ao EscritorDocxStreaming.bloco_imagens: separador, título e a grade de fotos já reduzidas"""
+        layout = layout or layout_padrao
+        imagens_data = list(imagens_data)
+        planejadas = layout.planejar(imagens_data)
+        linhas = layout.linhas(zip(imagens_reduzidas, planejadas))
+        _, tamanho_legenda, _, antes_legenda = _ESTILOS['legenda']
+        largura_coluna = layout.largura_coluna_cm * PONTOS_POR_CM
+        x_tabela = self._esquerda + (self._largura_util - largura_coluna * layout.colunas) / 2
+
+        def altura_linha(linha):
+            alturas = []
+            for _, (_, altura_cm, legenda) in linha:
+                legendas = quebrar_linhas(legenda, largura_coluna - 2 * FOLGA_CELULA, tamanho_legenda) if legenda else []
+                alturas.append(altura_cm * PONTOS_POR_CM + len(legendas) * tamanho_legenda * 1.25
+                               + (antes_legenda if legendas else 0))
+            return max(alturas) + 2 * FOLGA_CELULA
+
+        # O título não fica sozinho no fim da página: vai junto com a primeira linha de fotos
+        cabecalho = self._altura_paragrafo("-", "normal") + self._altura_paragrafo(titulo, "titulo2")
+        self._garantir_espaco(cabecalho + (altura_linha(linhas[0]) if linhas else 0))
+        self.paragrafo("------------------------------------------")
+        self.paragrafo(titulo, "titulo2")
+        for linha in linhas:
+            self._garantir_espaco(altura_linha(linha))
+            topo = self._y - FOLGA_CELULA
+            for coluna, (img_buffer, (largura_cm, altura_cm, legenda)) in enumerate(linha):
+                numero = self._gravar_imagem(img_buffer.getvalue())
+                nome = f"Im{numero}"
+                self._imagens_pagina[nome] = numero
+                largura, altura = largura_cm * PONTOS_POR_CM, altura_cm * PONTOS_POR_CM
+                x_celula = x_tabela + coluna * largura_coluna
+                self._conteudo.append(
+                    f"q {_numero(largura)} 0 0 {_numero(altura)} {_numero(x_celula + (largura_coluna - largura) / 2)} "
+                    f"{_numero(topo - altura)} cm /{nome} Do Q"
+                )
+                if legenda:
+                    y = topo - altura - antes_legenda
+                    for texto in quebrar_linhas(legenda, largura_coluna - 2 * FOLGA_CELULA, tamanho_legenda):
+                        y -= tamanho_legenda * 1.25
+                        x = x_celula + (largura_coluna - largura_texto(texto, tamanho_legenda)) / 2
+                        self._linha_texto(texto, x, y + tamanho_legenda * 0.25, 'legenda')
+            self._y -= altura_linha(linha)
+
+    def abortar(self):
+        if self._proprio:
+            self._arquivo.close()
+
+    def fechar(self):
+        self._fechar_pagina()
+        filhos = " ".join(f"{numero} 0 R" for numero in self._paginas)
+        self._objeto(f"<< /Type /Pages /Kids [{filhos}] /Count {len(self._paginas)} >>".encode(), self._PAGINAS)
+        self._objeto(f"<< /Type /Catalog /Pages {self._PAGINAS} 0 R >>".encode(), self._CATALOGO)
+        inicio_xref = self._posicao
+        total = self._proximo_objeto
+        entradas = ["0000000000 65535 f "] + [f"{self._deslocamentos[n]:010d} 00000 n " for n in range(1, total)]
+        self._gravar(
+            f"xref\n0 {total}\n".encode() + "\n".join(entradas).encode() + b"\n"
+            + f"trailer\n<< /Size {total} /Root {self._CATALOGO} 0 R >>\nstartxref\n{inicio_xref}\n%%EOF\n".encode()
+        )
+        if self._proprio:
+            self._arquivo.close()
+
+
+def escrever_relatorio_pdf(destino, site_id, data_execucao, localizacao, blocos, layout=None):
+    """Grava o PDF em `destino` (caminho ou arquivo aberto).
+
+    `blocos` são (título, fotos, fotos reduzidas), na ordem do relatório (ver relatorio.reduzir_blocos).
+    """
+    escritor = EscritorPdf(destino)
+    try:
+        escritor.paragrafo("RELATÓRIO FOTOGRÁFICO DE ZELADORIA", "titulo1")
+        escritor.paragrafo(f"Site ID: {site_id}")
+        escritor.paragrafo(f"Data da Execução: {data_execucao.strftime('%d/%m/%Y')}")
+        escritor.paragrafo(f"Localização: {localizacao.upper()}")
+        for titulo, imagens_data, reduzidas in blocos:
+            escritor.bloco_imagens(titulo, imagens_data, reduzidas, layout)
+    except BaseException:
+        escritor.abortar()
+        raise
+    with medir("gravacao_pdf"):
+        escritor.fechar()
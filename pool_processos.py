@@ -0,0 +1,239 @@
+"""Pool de processos compartilhado por todas as sessões do app, com fila justa por sessão.
+
+O trabalho pesado de imagem (compactação no upload, miniaturas e redução das fotos
+do relatório) roda em processos separados, fora do GIL do servidor do Streamlit:
+o relatório de 100 fotos de um técnico não trava a tela dos outros.
+
+Cada sessão tem a sua fila. O despachante mantém no máximo um trabalho por worker
+em execução e escolhe a próxima sessão em rodízio, então uma sessão com uma fila
+longa não passa na frente de quem pediu pouco. Os workers são criados e aquecidos
+(imports de PIL e numpy) quando o pool inicia, e não a cada relatório.
+
+Se um worker morre (falta de memória numa foto enorme, por exemplo), o pool é recriado
+e os trabalhos que estavam nele viram suspeitos: cada um roda de novo sozinho, sem nenhum
+outro trabalho em execução. Só o suspeito que derruba o pool rodando sozinho falha, então
+uma foto ruim não leva junto o trabalho de outras sessões.
+
+A montagem do .docx e do PDF continua no processo do Streamlit, na thread da tarefa
+(tarefas.py): ela só junta bytes já reduzidos pelo pool.
+
+Configuração por variável de ambiente:
+    RELATORIO_POOL_COMPARTILHADO_WORKERS  quantidade de processos (padrão: núcleos; 0 desliga o pool)
+"""
+import contextvars
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+from metricas import gravar_amostras, registro_padrao, reproduzir_amostras
+
+WORKERS_COMPARTILHADOS_PADRAO = int(
+    os.environ.get("RELATORIO_POOL_COMPARTILHADO_WORKERS", str(os.cpu_count() or 1))
+)
+
+_sessao_atual = contextvars.ContextVar("sessao_pool", default=None)
+
+
+@contextmanager
+def sessao(id_sessao):
+    """Trabalhos enviados dentro do bloco entram na fila desta sessão"""
+    token = _sessao_atual.set(id_sessao)
+    try:
+        yield
+    finally:
+        _sessao_atual.reset(token)
+
+
+def sessao_atual():
+    return _sessao_atual.get()
+
+
+def _aquecer():
+    # Roda uma vez em cada worker: os imports pesados ficam prontos antes do primeiro trabalho
+    import numpy  # noqa: F401
+    from PIL import Image
+
+    import processamento_imagens  # noqa: F401
+    import qualidade_fotos  # noqa: F401
+    import redimensionamento_lote  # noqa: F401
+    Image.init()
+
+
+def _nada():
+    return None
+
+
+def _executar_com_amostras(funcao, args):
+    with gravar_amostras() as amostras:
+        resultado = funcao(*args)
+    return resultado, amostras
+
+
+class PoolCompartilhado:
+    """Processos de longa duração + filas por sessão atendidas em rodízio"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = None
+        self._filas = OrderedDict()
+        self._suspeitos = deque()
+        self._isolado = False
+        self._em_execucao = 0
+        self._ocupado_s = 0.0
+        self._concluidos = 0
+        self._iniciado_em = None
+        self._condicao = threading.Condition()
+
+    @property
+    def ativo(self):
+        return self.workers > 0
+
+    def iniciar(self):
+        """Cria e aquece os processos (uma vez por processo do app)"""
+        with self._condicao:
+            if not self.ativo or self._executor is not None:
+                return
+            self._criar_executor()
+            self._iniciado_em = time.monotonic()
+            threading.Thread(target=self._despachar, daemon=True, name="pool-compartilhado").start()
+
+    def _criar_executor(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        # "spawn" evita herdar as threads e o estado do servidor do Streamlit num fork
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_aquecer
+        )
+        # Um trabalho vazio por worker faz o executor subir todos os processos já
+        for _ in range(self.workers):
+            self._executor.submit(_nada)
+
+    def enviar(self, id_sessao, funcao, *args):
+        """Enfileira `funcao(*args)` na fila da sessão e retorna um Future com o resultado"""
+        self.iniciar()
+        futuro = Future()
+        with self._condicao:
+            # O contexto de quem enviou recebe as medições feitas no worker (detalhamento do relatório)
+            contexto = contextvars.copy_context()
+            self._filas.setdefault(id_sessao, deque()).append((futuro, contexto, funcao, args, 0))
+            self._condicao.notify()
+        return futuro
+
+    def executar(self, funcao, *args):
+        """Executa no pool, na fila da sessão atual, e espera o resultado (direto, se o pool estiver desligado)"""
+        if not self.ativo:
+            return funcao(*args)
+        return self.enviar(sessao_atual(), funcao, *args).result()
+
+    def _proximo(self):
+        # Rodízio: a sessão atendida vai para o fim da fila de sessões
+        id_sessao, fila = next(iter(self._filas.items()))
+        trabalho = fila.popleft()
+        del self._filas[id_sessao]
+        if fila:
+            self._filas[id_sessao] = fila
+        return id_sessao, trabalho
+
+    def _pode_despachar(self):
+        if self._isolado:
+            return False
+        if self._suspeitos:
+            # Um suspeito só roda com o pool vazio, para que uma nova quebra aponte para ele
+            return self._em_execucao == 0
+        return bool(self._filas) and self._em_execucao < self.workers
+
+    def _despachar(self):
+        while True:
+            with self._condicao:
+                while not self._pode_despachar():
+                    self._condicao.wait()
+                if self._suspeitos:
+                    id_sessao, trabalho = self._suspeitos.popleft()
+                    self._isolado = True
+                else:
+                    id_sessao, trabalho = self._proximo()
+                futuro, contexto, funcao, args, tentativas = trabalho
+                # Numa repetição o Future já está em execução
+                if tentativas == 0 and not futuro.set_running_or_notify_cancel():
+                    continue
+                try:
+                    interno = self._executor.submit(_executar_com_amostras, funcao, args)
+                except BrokenProcessPool:
+                    # O pool quebrou antes deste envio: recria e tenta de novo
+                    self._criar_executor()
+                    try:
+                        interno = self._executor.submit(_executar_com_amostras, funcao, args)
+                    except BrokenProcessPool as e:
+                        self._isolado = False
+                        futuro.set_exception(e)
+                        continue
+                executor = self._executor
+                self._em_execucao += 1
+            inicio = time.monotonic()
+            interno.add_done_callback(
+                lambda f, id_sessao=id_sessao, trabalho=trabalho, executor=executor, inicio=inicio:
+                self._concluir(f, id_sessao, trabalho, executor, inicio)
+            )
+
+    def _concluir(self, interno, id_sessao, trabalho, executor, inicio):
+        futuro, contexto, funcao, args, tentativas = trabalho
+        try:
+            resultado, amostras = interno.result()
+        except BrokenProcessPool as e:
+            with self._condicao:
+                if executor is self._executor:
+                    self._criar_executor()
+                if tentativas == 0:
+                    # Estava no pool quando um worker morreu: roda de novo, sozinho
+                    self._em_execucao -= 1
+                    self._suspeitos.append((id_sessao, (futuro, contexto, funcao, args, 1)))
+                    self._condicao.notify()
+                    return
+            # Derrubou o pool rodando sozinho: o problema é deste trabalho
+            self._registrar_fim(inicio)
+            futuro.set_exception(e)
+            return
+        except BaseException as e:
+            self._registrar_fim(inicio)
+            futuro.set_exception(e)
+            return
+        self._registrar_fim(inicio)
+        contexto.run(reproduzir_amostras, amostras)
+        futuro.set_result(resultado)
+
+    def _registrar_fim(self, inicio):
+        with self._condicao:
+            self._em_execucao -= 1
+            self._isolado = False
+            self._ocupado_s += time.monotonic() - inicio
+            self._concluidos += 1
+            self._condicao.notify()
+
+    def estatisticas(self):
+        """Fila, workers ocupados e utilização desde que o pool iniciou"""
+        with self._condicao:
+            decorrido = time.monotonic() - self._iniciado_em if self._iniciado_em else 0
+            ocupado = self._ocupado_s
+            return {
+                'workers': self.workers,
+                'em_execucao': self._em_execucao,
+                'fila': sum(len(fila) for fila in self._filas.values()) + len(self._suspeitos),
+                'sessoes_na_fila': len(self._filas),
+                'concluidos': self._concluidos,
+                'utilizacao': ocupado / (decorrido * self.workers) if decorrido and self.workers else 0.0,
+            }
+
+
+# Pool compartilhado pelo processo do app
+pool_compartilhado = PoolCompartilhado(WORKERS_COMPARTILHADOS_PADRAO)
+registro_padrao.registrar_medidor("relatorio_pool_fila", "Trabalhos aguardando no pool compartilhado",
+                                  lambda: pool_compartilhado.estatisticas()['fila'])
+registro_padrao.registrar_medidor("relatorio_pool_em_execucao", "Workers do pool compartilhado ocupados agora",
+                                  lambda: pool_compartilhado.estatisticas()['em_execucao'])
+registro_padrao.registrar_medidor("relatorio_pool_utilizacao", "Fração do tempo com workers ocupados desde o início",
+                                  lambda: round(pool_compartilhado.estatisticas()['utilizacao'], 4))
@@ -0,0 +1,441 @@
+import contextvars
+import functools
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from PIL import Image
+
+from cache_imagens import cache_padrao, chave_imagem, hash_conteudo
+from metricas import contar_bytes, medir
+from pool_processos import pool_compartilhado, sessao_atual
+
+# Tamanho e tipo do pool de processamento (configuráveis por variável de ambiente). Dentro de uma
+# sessão do app (pool_processos.sessao) o padrão passa a ser o pool "compartilhado" entre sessões.
+WORKERS_PADRAO = int(os.environ.get("RELATORIO_WORKERS", "0")) or min(8, os.cpu_count() or 1)
+TIPO_POOL_PADRAO = os.environ.get("RELATORIO_POOL", "thread")
+# "rapido" pede ao decodificador JPEG uma versão já reduzida (escala DCT); "completo" decodifica tudo
+MODO_DECODIFICACAO_PADRAO = os.environ.get("RELATORIO_DECODIFICACAO", "rapido")
+# Lado máximo (px) das fotos guardadas na sessão após o upload; 0 guarda o original
+LADO_MAX_UPLOAD_PADRAO = int(os.environ.get("RELATORIO_COMPACTAR_PX", "1024"))
+QUALIDADE_UPLOAD_PADRAO = int(os.environ.get("RELATORIO_COMPACTAR_QUALIDADE", "85"))
+# "pil" redimensiona foto a foto (LANCZOS); "numpy" redimensiona juntas as fotos de mesmo tamanho
+MOTOR_REDIMENSIONAMENTO_PADRAO = os.environ.get("RELATORIO_REDIMENSIONAMENTO", "pil")
+TAMANHO_LOTE_NUMPY = int(os.environ.get("RELATORIO_LOTE_NUMPY", "16"))
+LADO_MINIATURA_PADRAO = 300
+# Densidade das fotos no documento. O DPI gravado pelo celular (72, 300 ou valores estranhos)
+# não diz nada sobre a foto, então o tamanho em pixels vem só do espaço ocupado na página.
+DENSIDADE_ALVO_PPI = int(os.environ.get("RELATORIO_DENSIDADE_PPI", "96"))
+
+# O que o PIL levanta para um arquivo que não é uma foto legível (cortado, HEIC renomeado, outro formato)
+ERROS_ARQUIVO_INVALIDO = (OSError, SyntaxError, ValueError, Image.DecompressionBombError)
+
+TAG_ORIENTACAO = 0x0112
+# Orientação EXIF -> transposição que deixa a foto em pé (mesma tabela do ImageOps.exif_transpose)
+_TRANSPOSICOES = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+_TRANSPOSICOES_90 = (Image.Transpose.TRANSPOSE, Image.Transpose.ROTATE_270, Image.Transpose.TRANSVERSE,
+                     Image.Transpose.ROTATE_90)
+
+# Perfis de codificação das imagens inseridas no relatório. Os de JPEG controlam qualidade,
+# subamostragem de cor e metadados; o "paleta" gera PNG com poucas cores, bom para fotos
+# de placa (texto e cores chapadas ficam nítidos e o arquivo fica pequeno).
+PERFIS_CODIFICACAO = {
+    "padrao": {"formato": "JPEG", "qualidade": 75, "subamostragem": "4:2:0", "progressivo": False,
+               "remover_metadados": True},
+    "compacto": {"formato": "JPEG", "qualidade": 60, "subamostragem": "4:2:0", "progressivo": True,
+                 "remover_metadados": True},
+    "alta": {"formato": "JPEG", "qualidade": 90, "subamostragem": "4:4:4", "progressivo": False,
+             "remover_metadados": False},
+    "paleta": {"formato": "PNG", "cores": 64, "remover_metadados": True},
+}
+PERFIL_PADRAO = os.environ.get("RELATORIO_PERFIL", "padrao")
+# Perfil da foto da placa de identificação (por exemplo "paleta")
+PERFIL_PLACA_PADRAO = os.environ.get("RELATORIO_PERFIL_PLACA", PERFIL_PADRAO)
+
+
+def obter_perfil(nome):
+    """Configuração do perfil de codificação pelo nome"""
+    try:
+        return PERFIS_CODIFICACAO[nome]
+    except KeyError:
+        raise ValueError(f"Perfil de codificação desconhecido: {nome} "
+                         f"(disponíveis: {', '.join(PERFIS_CODIFICACAO)})") from None
+
+
+def _achatar_transparencia(img):
+    """Compõe imagens com transparência sobre fundo branco (a cor da página)"""
+    if img.mode == "P" and "transparency" in img.info:
+        img = img.convert("RGBA")
+    if img.mode in ("RGBA", "LA", "PA"):
+        img = img.convert("RGBA")
+        fundo = Image.new("RGB", img.size, "white")
+        fundo.paste(img, mask=img.getchannel("A"))
+        return fundo
+    if img.mode not in ("RGB", "L"):
+        return img.convert("RGB")
+    return img
+
+
+def codificar_imagem(img, perfil=None, info=None):
+    """Codifica a imagem já reduzida conforme o perfil e retorna os bytes.
+
+    `info` são os metadados da foto original, usados quando o perfil não os remove.
+    """
+    config = obter_perfil(perfil or PERFIL_PADRAO)
+    info = info or {}
+    img = _achatar_transparencia(img)
+    opcoes = {}
+    if not config["remover_metadados"]:
+        for campo in ("exif", "icc_profile"):
+            if info.get(campo):
+                opcoes[campo] = info[campo]
+    buffer = io.BytesIO()
+    if config["formato"] == "PNG":
+        img = img.convert("RGB").quantize(colors=config["cores"], method=Image.Quantize.MEDIANCUT,
+                                          dither=Image.Dither.NONE)
+        opcoes.pop("exif", None)
+        img.save(buffer, format="PNG", optimize=True, **opcoes)
+    else:
+        img.save(buffer, format="JPEG", quality=config["qualidade"], subsampling=config["subamostragem"],
+                 optimize=True, progressive=config["progressivo"], **opcoes)
+    return buffer.getvalue()
+
+
+def pixels_alvo(largura_cm, altura_cm):
+    """Tamanho em pixels do espaço da foto no documento, na densidade fixa DENSIDADE_ALVO_PPI"""
+    return int(largura_cm / 2.54 * DENSIDADE_ALVO_PPI), int(altura_cm / 2.54 * DENSIDADE_ALVO_PPI)
+
+
+def ler_orientacao(img):
+    """Orientação EXIF (1 a 8) lida só do cabeçalho, sem decodificar os pixels"""
+    exif_bruto = img.info.get("exif")
+    if not exif_bruto:
+        return 1
+    try:
+        exif = Image.Exif()
+        exif.load(exif_bruto)
+        orientacao = int(exif.get(TAG_ORIENTACAO, 1))
+    except Exception:
+        return 1
+    return orientacao if orientacao in _TRANSPOSICOES else 1
+
+
+def _sem_orientacao(info):
+    """Metadados com a orientação zerada, já que os pixels saem na posição correta"""
+    if not info.get("exif"):
+        return info
+    try:
+        exif = Image.Exif()
+        exif.load(info["exif"])
+        exif[TAG_ORIENTACAO] = 1
+        return {**info, "exif": exif.tobytes()}
+    except Exception:
+        # EXIF ilegível: melhor descartar do que arriscar girar a foto de novo no Word
+        return {campo: valor for campo, valor in info.items() if campo != "exif"}
+
+
+def encaixar(largura, altura, largura_max, altura_max):
+    """Maior tamanho com a proporção de largura x altura que cabe em largura_max x altura_max"""
+    escala = min(largura_max / largura, altura_max / altura)
+    return largura * escala, altura * escala
+
+
+def ler_dimensoes(imagem_bytes):
+    """Largura e altura da foto já na orientação EXIF, lidas só do cabeçalho"""
+    with Image.open(imagem_bytes) as img:
+        largura, altura = img.size
+        if _TRANSPOSICOES.get(ler_orientacao(img)) in _TRANSPOSICOES_90:
+            return altura, largura
+        return largura, altura
+
+
+def _abrir(imagem_bytes, largura_cm, altura_cm, modo_decodificacao=None, encaixe=False):
+    """Abre a foto (só o cabeçalho) e prepara a decodificação.
+
+    Com `encaixe=True`, largura_cm x altura_cm é a moldura: a foto mantém a proporção, cabe nela
+    e nunca é ampliada. Retorna (imagem, (largura_px, altura_px) antes da rotação, transposição EXIF ou None).
+    """
+    modo_decodificacao = modo_decodificacao or MODO_DECODIFICACAO_PADRAO
+    img = Image.open(imagem_bytes)
+    largura_px, altura_px = pixels_alvo(largura_cm, altura_cm)
+    transposicao = _TRANSPOSICOES.get(ler_orientacao(img))
+    if encaixe:
+        largura, altura = img.size
+        if transposicao in _TRANSPOSICOES_90:
+            largura, altura = altura, largura
+        largura_px, altura_px = encaixar(largura, altura, min(largura_px, largura), min(altura_px, altura))
+        largura_px, altura_px = max(1, round(largura_px)), max(1, round(altura_px))
+    if transposicao in _TRANSPOSICOES_90:
+        # A foto será girada depois da redução: reduz para as dimensões trocadas
+        largura_px, altura_px = altura_px, largura_px
+    if modo_decodificacao == "rapido":
+        # Só tem efeito em JPEG: decodifica em 1/2, 1/4 ou 1/8 sem ficar menor que o alvo
+        img.draft("RGB", (largura_px, altura_px))
+    return img, (largura_px, altura_px), transposicao
+
+
+def _abrir_decodificada(imagem_bytes, largura_cm, altura_cm, modo_decodificacao=None, encaixe=False):
+    """Decodifica a foto para a redução.
+
+    Retorna (imagem, metadados originais, (largura_px, altura_px), transposição EXIF ou None).
+    """
+    img, alvo, transposicao = _abrir(imagem_bytes, largura_cm, altura_cm, modo_decodificacao, encaixe)
+    with img:
+        with medir("decodificacao"):
+            img.load()
+        info = img.info
+        # PNG com transparência ou paleta: compõe sobre branco antes, para redimensionar em RGB
+        return _achatar_transparencia(img), info, alvo, transposicao
+
+
+def _orientar(img, transposicao):
+    # Girar a foto já reduzida é uma cópia de poucos KB, sem nova reamostragem
+    return img.transpose(transposicao) if transposicao is not None else img
+
+
+def reduzir_imagem(imagem_bytes, largura_cm, altura_cm, modo_decodificacao=None, perfil=None, encaixe=False):
+    img, info, alvo, transposicao = _abrir_decodificada(imagem_bytes, largura_cm, altura_cm, modo_decodificacao,
+                                                        encaixe)
+    with medir("redimensionamento"):
+        img = _orientar(img.resize(alvo, Image.LANCZOS), transposicao)
+    with medir("codificacao"):
+        return io.BytesIO(codificar_imagem(img, perfil, _sem_orientacao(info)))
+
+
+def compactar_foto(dados, lado_max_px=None, qualidade=None):
+    """Reduz e recodifica a foto enviada para um tamanho limitado.
+
+    Mantém DPI e EXIF (inclusive a orientação, aplicada só na redução final do relatório).
+    Retorna (bytes, tipo MIME); devolve o original se ele já for menor.
+    """
+    lado_max_px = LADO_MAX_UPLOAD_PADRAO if lado_max_px is None else lado_max_px
+    qualidade = qualidade or QUALIDADE_UPLOAD_PADRAO
+    with Image.open(io.BytesIO(dados)) as img:
+        formato = img.format
+        if not lado_max_px or max(img.size) <= lado_max_px and formato == "JPEG":
+            return dados, Image.MIME.get(formato, "image/jpeg")
+        opcoes = {}
+        if "dpi" in img.info:
+            opcoes["dpi"] = img.info["dpi"]
+        if "exif" in img.info:
+            opcoes["exif"] = img.info["exif"]
+        img.draft("RGB", (lado_max_px, lado_max_px))
+        img.thumbnail((lado_max_px, lado_max_px), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if img.mode in ("RGBA", "LA", "P"):
+            img.save(buffer, format="PNG", optimize=True, **opcoes)
+            tipo = "image/png"
+        else:
+            img.convert("RGB").save(buffer, format="JPEG", quality=qualidade, **opcoes)
+            tipo = "image/jpeg"
+    if buffer.tell() >= len(dados):
+        return dados, Image.MIME.get(formato, "image/jpeg")
+    return buffer.getvalue(), tipo
+
+
+def gerar_miniatura(dados, lado_px=LADO_MINIATURA_PADRAO):
+    """Gera uma miniatura JPEG pequena para o preview na tela, já na orientação EXIF"""
+    with Image.open(io.BytesIO(dados)) as img:
+        transposicao = _TRANSPOSICOES.get(ler_orientacao(img))
+        img.draft("RGB", (lado_px, lado_px))
+        img.thumbnail((lado_px, lado_px), Image.BILINEAR)
+        img = _orientar(img, transposicao)
+        buffer = io.BytesIO()
+        img.convert("RGB").save(buffer, format="JPEG", quality=75)
+    return buffer.getvalue()
+
+
+def extrair_bytes(imagem):
+    """Obtém os bytes da imagem, seja dict do session state ou UploadedFile"""
+    if isinstance(imagem, dict):  # Dados do session state
+        return imagem['data']
+    if isinstance(imagem, (bytes, bytearray, memoryview)):
+        return bytes(imagem)
+    return imagem.getvalue()  # UploadedFile normal
+
+
+def _reduzir_bytes(dados, largura_cm, altura_cm, modo_decodificacao=None, perfil=None, encaixe=False):
+    return reduzir_imagem(io.BytesIO(dados), largura_cm, altura_cm, modo_decodificacao, perfil, encaixe)
+
+
+def _reduzir_lote_bytes(lista_dados, largura_cm, altura_cm, modo_decodificacao=None, perfil=None, encaixe=False):
+    """Reduz várias fotos de uma vez: as de mesmo tamanho são redimensionadas juntas com NumPy.
+
+    Fotos de tamanho único no lote (ou com transparência/paleta) seguem pelo LANCZOS do Pillow.
+    Retorna os bytes na mesma ordem.
+    """
+    import numpy as np
+
+    from redimensionamento_lote import reduzir_area_lote
+
+    # Agrupa pelo cabeçalho (tamanho já com o draft aplicado), antes de decodificar qualquer foto
+    abertas = [_abrir(io.BytesIO(d), largura_cm, altura_cm, modo_decodificacao, encaixe) for d in lista_dados]
+    grupos = {}
+    for i, (img, alvo, _) in enumerate(abertas):
+        chave = (img.size, img.mode, alvo) if img.mode in ("RGB", "L") else i
+        grupos.setdefault(chave, []).append(i)
+
+    reduzidas = [None] * len(lista_dados)
+    infos = [None] * len(lista_dados)
+    for chave, indices in grupos.items():
+        if len(indices) == 1:
+            i = indices[0]
+            abertas[i][0].close()
+            img, infos[i], alvo, transposicao = _abrir_decodificada(io.BytesIO(lista_dados[i]), largura_cm,
+                                                                    altura_cm, modo_decodificacao, encaixe)
+            with medir("redimensionamento"):
+                reduzidas[i] = _orientar(img.resize(alvo, Image.LANCZOS), transposicao)
+            continue
+        (largura, altura), modo, alvo = chave
+        # Cada foto é decodificada direto na sua posição da pilha e liberada em seguida
+        pilha = np.empty((len(indices), altura, largura, 3 if modo == "RGB" else 1), dtype=np.uint8)
+        for j, i in enumerate(indices):
+            with abertas[i][0] as img:
+                with medir("decodificacao"):
+                    img.load()
+                infos[i] = img.info
+                pilha[j] = np.asarray(img).reshape(pilha.shape[1:])
+        with medir("redimensionamento"):
+            lote = reduzir_area_lote(pilha, alvo[0], alvo[1])
+        del pilha
+        for i, reduzida in zip(indices, lote):
+            img = Image.fromarray(reduzida[..., 0] if modo == "L" else reduzida, modo)
+            reduzidas[i] = _orientar(img, abertas[i][2])
+
+    resultado = []
+    for img, info in zip(reduzidas, infos):
+        with medir("codificacao"):
+            resultado.append(codificar_imagem(img, perfil, _sem_orientacao(info)))
+    return resultado
+
+
+def _reduzir_grupo(lista_dados, largura_cm, altura_cm, modo_decodificacao, perfil, motor, encaixe):
+    if motor == "numpy" and len(lista_dados) > 1:
+        return _reduzir_lote_bytes(lista_dados, largura_cm, altura_cm, modo_decodificacao, perfil, encaixe)
+    return [
+        _reduzir_bytes(d, largura_cm, altura_cm, modo_decodificacao, perfil, encaixe).getvalue() for d in lista_dados
+    ]
+
+
+def reduzir_imagens_em_paralelo(imagens, largura_cm=5, altura_cm=4, workers=None, tipo_pool=None,
+                                modo_decodificacao=None, cache=None, progresso=None, perfil=None, motor=None,
+                                encaixe=False):
+    """Reduz várias imagens ao mesmo tempo num pool de threads ou processos.
+
+    Fotos repetidas na entrada são reduzidas uma vez só e compartilham o mesmo resultado, e fotos
+    já presentes no cache (mesmo conteúdo e mesmos parâmetros) não são processadas de novo.
+    Com `encaixe=True` cada foto mantém a proporção dentro da moldura largura_cm x altura_cm.
+    Com `motor="numpy"` cada worker recebe um lote de fotos e redimensiona as de mesmo tamanho juntas.
+    Se informado, `progresso(n)` é chamado a cada grupo de imagens concluído.
+    Retorna buffers em memória (BytesIO) com as imagens reduzidas, codificadas conforme o `perfil`,
+    na mesma ordem da entrada.
+    """
+    with medir("reducao_imagens"):
+        return _reduzir_imagens(imagens, largura_cm, altura_cm, workers, tipo_pool, modo_decodificacao, cache,
+                                progresso, perfil, motor, encaixe)
+
+
+def _reduzir_imagens(imagens, largura_cm, altura_cm, workers, tipo_pool, modo_decodificacao, cache, progresso,
+                     perfil, motor, encaixe):
+    workers = workers or WORKERS_PADRAO
+    if tipo_pool is None and sessao_atual() is not None and pool_compartilhado.ativo:
+        tipo_pool = "compartilhado"
+    tipo_pool = tipo_pool or TIPO_POOL_PADRAO
+    if tipo_pool == "compartilhado":
+        workers = pool_compartilhado.workers
+    modo_decodificacao = modo_decodificacao or MODO_DECODIFICACAO_PADRAO
+    perfil = perfil or PERFIL_PADRAO
+    motor = motor or MOTOR_REDIMENSIONAMENTO_PADRAO
+    obter_perfil(perfil)  # Falha logo com um nome inválido, antes de abrir o pool
+    cache = cache_padrao if cache is None else cache
+    dados = [extrair_bytes(imagem) for imagem in imagens]
+    if not dados:
+        return []
+    contar_bytes("fotos_entrada", sum(len(d) for d in dados))
+
+    # Deduplicação por conteúdo: cada hash é reduzido (ou buscado no cache) uma única vez
+    hashes = [hash_conteudo(d) for d in dados]
+    indices_por_hash = {}
+    for i, digest in enumerate(hashes):
+        indices_por_hash.setdefault(digest, []).append(i)
+
+    def chave(digest):
+        return chave_imagem(digest, largura_cm, altura_cm, DENSIDADE_ALVO_PPI, encaixe, modo_decodificacao, perfil,
+                            motor)
+
+    reduzidas = {}
+    pendentes = []
+    for digest, indices in indices_por_hash.items():
+        if cache:
+            em_cache = cache.obter(chave(digest))
+            if em_cache is not None:
+                reduzidas[digest] = em_cache
+                if progresso:
+                    progresso(len(indices))
+                continue
+        pendentes.append(digest)
+
+    # Com o motor NumPy as fotos são divididas em lotes, um por worker (limitados a TAMANHO_LOTE_NUMPY)
+    if motor == "numpy":
+        tamanho_grupo = max(1, min(TAMANHO_LOTE_NUMPY, -(-len(pendentes) // workers)))
+    else:
+        tamanho_grupo = 1
+    grupos = [pendentes[i:i + tamanho_grupo] for i in range(0, len(pendentes), tamanho_grupo)]
+
+    def concluir(grupo, resultados):
+        for digest, resultado in zip(grupo, resultados):
+            reduzidas[digest] = resultado
+            if progresso:
+                progresso(len(indices_por_hash[digest]))
+
+    if tipo_pool == "compartilhado":
+        # Mesmo um grupo só vai para o pool: o trabalho pesado fica fora do processo do app
+        executor_cls = None
+        futures = {
+            pool_compartilhado.enviar(sessao_atual(), _reduzir_grupo, [dados[indices_por_hash[d][0]] for d in grupo],
+                                      largura_cm, altura_cm, modo_decodificacao, perfil, motor, encaixe): grupo
+            for grupo in grupos
+        }
+        for future in as_completed(futures):
+            concluir(futures[future], future.result())
+        grupos = []
+    elif workers <= 1 or len(grupos) <= 1:
+        executor_cls = None
+    elif tipo_pool == "process":
+        executor_cls = ProcessPoolExecutor
+    else:
+        executor_cls = ThreadPoolExecutor
+
+    if executor_cls is None:
+        for grupo in grupos:
+            concluir(grupo, _reduzir_grupo([dados[indices_por_hash[d][0]] for d in grupo], largura_cm, altura_cm,
+                                           modo_decodificacao, perfil, motor, encaixe))
+    else:
+        with executor_cls(max_workers=min(workers, len(grupos))) as executor:
+            if executor_cls is ThreadPoolExecutor:
+                # Leva o contexto (detalhamento de métricas do relatório) para as threads do pool
+                def submeter(*args):
+                    return executor.submit(contextvars.copy_context().run, _reduzir_grupo, *args)
+            else:
+                submeter = functools.partial(executor.submit, _reduzir_grupo)
+            futures = {
+                submeter([dados[indices_por_hash[d][0]] for d in grupo], largura_cm, altura_cm, modo_decodificacao,
+                         perfil, motor, encaixe): grupo
+                for grupo in grupos
+            }
+            for future in as_completed(futures):
+                concluir(futures[future], future.result())
+
+    if cache:
+        for digest in pendentes:
+            cache.guardar(chave(digest), reduzidas[digest])
+    contar_bytes("fotos_reduzidas", sum(len(reduzidas[digest]) for digest in hashes))
+    return [io.BytesIO(reduzidas[digest]) for digest in hashes]
@@ -0,0 +1,103 @@
+"""Controle de qualidade das fotos no upload, antes de gastar CPU com elas.
+
+Cada foto é avaliada numa prévia pequena em tons de cinza (o JPEG já é
+decodificado reduzido, pelo draft), com métricas vetorizadas em NumPy:
+    nitidez     variância do Laplaciano (foto tremida ou fora de foco fica baixa)
+    exposição   histograma: fração de pixels quase pretos e quase brancos
+    assinatura  hash perceptual de diferença (dHash, 64 bits) para achar fotos quase iguais
+    tamanho     lado menor da foto original (miniaturas e capturas de tela pequenas)
+
+A avaliação custa uma fração da compactação e da redução, e uma foto descartada
+não passa por nenhuma das duas.
+
+Configuração por variável de ambiente:
+    RELATORIO_QUALIDADE            "avisar" (padrão) marca as fotos com problema, "descartar" não as aceita,
+                                   "desligado" não avalia
+    RELATORIO_NITIDEZ_MIN          variância mínima do Laplaciano na prévia (padrão 40)
+    RELATORIO_LADO_MIN_PX          lado menor mínimo da foto original (padrão 480)
+    RELATORIO_DISTANCIA_DUPLICATA  bits diferentes na assinatura para ainda ser quase igual (padrão 6)
+"""
+import io
+import os
+
+import numpy as np
+from PIL import Image
+
+MODO_QUALIDADE = os.environ.get("RELATORIO_QUALIDADE", "avisar")
+NITIDEZ_MIN = float(os.environ.get("RELATORIO_NITIDEZ_MIN", "40"))
+LADO_MIN_PX = int(os.environ.get("RELATORIO_LADO_MIN_PX", "480"))
+DISTANCIA_DUPLICATA = int(os.environ.get("RELATORIO_DISTANCIA_DUPLICATA", "6"))
+
+# A nitidez depende da escala: as métricas são sempre calculadas numa prévia deste tamanho
+LADO_PREVIA_PX = 512
+# Pixels abaixo/acima destes níveis contam como pretos/brancos; mais que a fração, a foto é escura/estourada
+NIVEL_ESCURO = 20
+NIVEL_CLARO = 235
+FRACAO_EXPOSICAO = 0.5
+BRILHO_MIN = 40
+BRILHO_MAX = 220
+
+
+def _previa(dados, lado_px):
+    """(largura, altura) originais e a prévia em tons de cinza com no máximo `lado_px` de lado"""
+    with Image.open(io.BytesIO(dados)) as img:
+        tamanho = img.size
+        img.draft("L", (lado_px, lado_px))
+        previa = img.convert("L")
+    previa.thumbnail((lado_px, lado_px), Image.BILINEAR)
+    return tamanho, previa
+
+
+def assinatura(previa):
+    """dHash: cada bit diz se um pixel é mais claro que o vizinho da direita, numa grade 9x8"""
+    pequena = np.asarray(previa.resize((9, 8), Image.BOX), dtype=np.int16)
+    bits = (pequena[:, 1:] > pequena[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def distancia(assinatura_a, assinatura_b):
+    """Quantidade de bits diferentes entre duas assinaturas (0 = mesma imagem)"""
+    return (assinatura_a ^ assinatura_b).bit_count()
+
+
+def avaliar_foto(dados, lado_previa=LADO_PREVIA_PX):
+    """Métricas de qualidade da foto, calculadas na prévia reduzida"""
+    (largura, altura), previa = _previa(dados, lado_previa)
+    pixels = np.asarray(previa)
+    cinza = pixels.astype(np.float32)
+    # Laplaciano 4-vizinhos por fatias do array (sem laço por pixel)
+    laplaciano = (cinza[1:-1, :-2] + cinza[1:-1, 2:] + cinza[:-2, 1:-1] + cinza[2:, 1:-1]
+                  - 4 * cinza[1:-1, 1:-1])
+    histograma = np.bincount(pixels.ravel(), minlength=256) / pixels.size
+    return {
+        'largura': largura,
+        'altura': altura,
+        'nitidez': float(laplaciano.var()) if laplaciano.size else 0.0,
+        'brilho': float(cinza.mean()),
+        'escuros': float(histograma[:NIVEL_ESCURO].sum()),
+        'claros': float(histograma[NIVEL_CLARO + 1:].sum()),
+        'assinatura': assinatura(previa),
+    }
+
+
+def problemas_foto(metricas, assinaturas_vizinhas=()):
+    """Problemas encontrados nas métricas, em texto para o usuário.
+
+    `assinaturas_vizinhas` são as assinaturas das fotos já aceitas na mesma categoria, na
+    ordem delas (None para as que não foram avaliadas); a foto quase igual é citada pelo número.
+    """
+    problemas = []
+    if min(metricas['largura'], metricas['altura']) < LADO_MIN_PX:
+        problemas.append(f"muito pequena ({metricas['largura']}x{metricas['altura']} px)")
+    if metricas['escuros'] > FRACAO_EXPOSICAO or metricas['brilho'] < BRILHO_MIN:
+        problemas.append("muito escura")
+    elif metricas['claros'] > FRACAO_EXPOSICAO or metricas['brilho'] > BRILHO_MAX:
+        problemas.append("muito clara")
+    # Sem contraste (escura ou estourada) o Laplaciano fica baixo mesmo com foco: só avalia com exposição boa
+    elif metricas['nitidez'] < NITIDEZ_MIN:
+        problemas.append("desfocada ou tremida")
+    for numero, outra in enumerate(assinaturas_vizinhas, start=1):
+        if outra is not None and distancia(metricas['assinatura'], outra) <= DISTANCIA_DUPLICATA:
+            problemas.append(f"quase igual à foto {numero}")
+            break
+    return problemas
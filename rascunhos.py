@@ -0,0 +1,242 @@
+"""Rascunhos persistentes do relatório, para não perder nada numa reconexão.
+
+Os campos do formulário e a lista de fotos de cada rascunho ficam num banco SQLite;
+os bytes das fotos ficam numa pasta de blobs endereçada pelo hash do conteúdo.
+O rascunho é identificado por um token que vai na URL (?rascunho=...).
+Cada blob é guardado uma única vez, com contagem de referências: a mesma foto em
+várias categorias, rascunhos ou sessões ocupa o disco uma vez só.
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date
+
+PASTA_RASCUNHOS_PADRAO = os.environ.get(
+    "RELATORIO_RASCUNHOS_DIR", os.path.join(tempfile.gettempdir(), "relatorio_rascunhos")
+)
+VALIDADE_RASCUNHO_S = int(os.environ.get("RELATORIO_RASCUNHOS_VALIDADE_S", str(7 * 24 * 3600)))
+INTERVALO_LIMPEZA_S = 600
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS rascunhos (
+    token TEXT PRIMARY KEY,
+    site_id TEXT NOT NULL DEFAULT '',
+    data_execucao TEXT,
+    localizacao TEXT NOT NULL DEFAULT '',
+    atualizado_em REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fotos (
+    token TEXT NOT NULL,
+    chave TEXT NOT NULL,
+    id_foto TEXT NOT NULL,
+    posicao INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    tamanho_original INTEGER NOT NULL,
+    origem TEXT NOT NULL DEFAULT 'upload',
+    hash_envio TEXT,
+    PRIMARY KEY (token, chave, id_foto)
+);
+CREATE INDEX IF NOT EXISTS idx_fotos_hash ON fotos (hash);
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    tamanho INTEGER NOT NULL,
+    referencias INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS foto_inserida AFTER INSERT ON fotos BEGIN
+    UPDATE blobs SET referencias = referencias + 1 WHERE hash = NEW.hash;
+END;
+CREATE TRIGGER IF NOT EXISTS foto_removida AFTER DELETE ON fotos BEGIN
+    UPDATE blobs SET referencias = referencias - 1 WHERE hash = OLD.hash;
+END;
+"""
+
+
+class ArmazemRascunhos:
+    """Banco SQLite com os rascunhos + pasta de blobs com os bytes das fotos"""
+
+    def __init__(self, pasta, validade_s):
+        self.pasta = pasta
+        self.validade_s = validade_s
+        self.pasta_blobs = os.path.join(pasta, "blobs")
+        self.caminho_banco = os.path.join(pasta, "rascunhos.sqlite3")
+        self._ultima_limpeza = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.pasta_blobs, exist_ok=True)
+        with self._conectar() as conexao:
+            conexao.executescript(_ESQUEMA)
+            # Bancos criados antes de guardar o hash do arquivo enviado (usado na deduplicação da sessão)
+            colunas = [linha[1] for linha in conexao.execute("PRAGMA table_info(fotos)")]
+            if "hash_envio" not in colunas:
+                conexao.execute("ALTER TABLE fotos ADD COLUMN hash_envio TEXT")
+            # Bancos criados antes da contagem de referências: reconstrói a partir das fotos existentes
+            if conexao.execute("SELECT COUNT(*) FROM blobs").fetchone()[0] == 0:
+                for digest, referencias in conexao.execute("SELECT hash, COUNT(*) FROM fotos GROUP BY hash").fetchall():
+                    dados = self._ler_blob(digest)
+                    conexao.execute("INSERT INTO blobs (hash, tamanho, referencias) VALUES (?, ?, ?)",
+                                    (digest, len(dados) if dados else 0, referencias))
+
+    @contextmanager
+    def _conectar(self):
+        """Conexão curta, com commit ao final (ou rollback se der erro)"""
+        conexao = sqlite3.connect(self.caminho_banco, timeout=10)
+        # Necessário para que o INSERT OR REPLACE dispare o gatilho de remoção
+        conexao.execute("PRAGMA recursive_triggers = ON")
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def _caminho_blob(self, digest):
+        return os.path.join(self.pasta_blobs, digest[:2], digest)
+
+    def _gravar_blob(self, digest, dados, regravar=False):
+        caminho = self._caminho_blob(digest)
+        if regravar or not os.path.exists(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+            with open(temporario, "wb") as arquivo:
+                arquivo.write(dados)
+            os.replace(temporario, caminho)
+
+    def _ler_blob(self, digest):
+        try:
+            with open(self._caminho_blob(digest), "rb") as arquivo:
+                return arquivo.read()
+        except FileNotFoundError:
+            return None
+
+    def novo_token(self):
+        return uuid.uuid4().hex
+
+    def salvar_campos(self, token, site_id, data_execucao, localizacao):
+        with self._conectar() as conexao:
+            conexao.execute(
+                "INSERT INTO rascunhos (token, site_id, data_execucao, localizacao, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT(token) DO UPDATE SET site_id = excluded.site_id, "
+                "data_execucao = excluded.data_execucao, localizacao = excluded.localizacao, "
+                "atualizado_em = excluded.atualizado_em",
+                (token, site_id, data_execucao.isoformat() if data_execucao else None, localizacao, time.time())
+            )
+
+    def salvar_fotos(self, token, chave, fotos_data, ja_salvas=()):
+        """Sincroniza as fotos de uma categoria: grava só as novas e remove as que saíram.
+
+        `ja_salvas` são os IDs que a sessão sabe que já estão no banco; retorna os IDs salvos agora.
+        """
+        novas = [(id_foto, foto) for id_foto, foto in fotos_data.items() if id_foto not in ja_salvas]
+        hashes = {id_foto: hashlib.sha256(foto['data']).hexdigest() for id_foto, foto in novas}
+        posicoes = {id_foto: i for i, id_foto in enumerate(fotos_data)}
+        with self._conectar() as conexao:
+            conexao.execute(
+                "INSERT OR IGNORE INTO rascunhos (token, atualizado_em) VALUES (?, ?)", (token, time.time())
+            )
+            # Os blobs são gravados dentro da transação, que exclui a da limpeza (limpar_expirados).
+            # Sem a linha do blob, a limpeza pode ter acabado de apagar o arquivo: ele é regravado.
+            for id_foto, foto in novas:
+                inserido = conexao.execute(
+                    "INSERT OR IGNORE INTO blobs (hash, tamanho, referencias) VALUES (?, ?, 0)",
+                    (hashes[id_foto], len(foto['data']))
+                ).rowcount
+                self._gravar_blob(hashes[id_foto], foto['data'], regravar=bool(inserido))
+            # REPLACE dispara a remoção da linha antiga, então a contagem de referências continua certa
+            conexao.executemany(
+                "INSERT OR REPLACE INTO fotos (token, chave, id_foto, posicao, hash, nome, tipo, tamanho_original, "
+                "origem, hash_envio) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(token, chave, id_foto, posicoes[id_foto], hashes[id_foto], foto['name'], foto['type'],
+                  foto.get('original_size', foto['size']), foto.get('origem', 'upload'), foto.get('hash'))
+                 for id_foto, foto in novas]
+            )
+            removidas = [id_foto for id_foto in ja_salvas if id_foto not in fotos_data]
+            conexao.executemany(
+                "DELETE FROM fotos WHERE token = ? AND chave = ? AND id_foto = ?",
+                [(token, chave, id_foto) for id_foto in removidas]
+            )
+            conexao.execute("UPDATE rascunhos SET atualizado_em = ? WHERE token = ?", (time.time(), token))
+        return set(fotos_data)
+
+    def carregar(self, token):
+        """Retorna o rascunho como dict (campos + fotos por categoria) ou None se não existir"""
+        with self._conectar() as conexao:
+            linha = conexao.execute(
+                "SELECT site_id, data_execucao, localizacao FROM rascunhos WHERE token = ?", (token,)
+            ).fetchone()
+            if linha is None:
+                return None
+            fotos = conexao.execute(
+                "SELECT chave, id_foto, hash, nome, tipo, tamanho_original, origem, hash_envio FROM fotos "
+                "WHERE token = ? ORDER BY chave, posicao", (token,)
+            ).fetchall()
+        rascunho = {
+            'site_id': linha[0],
+            'data_execucao': date.fromisoformat(linha[1]) if linha[1] else None,
+            'localizacao': linha[2],
+            'fotos': {},
+        }
+        blobs = {}
+        for chave, id_foto, digest, nome, tipo, tamanho_original, origem, hash_envio in fotos:
+            # A mesma foto em mais de uma categoria é lida uma vez e compartilhada
+            if digest not in blobs:
+                blobs[digest] = self._ler_blob(digest)
+            dados = blobs[digest]
+            if dados is None:
+                continue
+            rascunho['fotos'].setdefault(chave, {})[id_foto] = {
+                'name': nome,
+                'size': len(dados),
+                'original_size': tamanho_original,
+                'type': tipo,
+                'data': dados,
+                'origem': origem,
+                # Rascunhos antigos não têm o hash do envio: o do blob ainda deduplica entre eles
+                'hash': hash_envio or digest,
+            }
+        return rascunho
+
+    def apagar(self, token):
+        with self._conectar() as conexao:
+            conexao.execute("DELETE FROM fotos WHERE token = ?", (token,))
+            conexao.execute("DELETE FROM rascunhos WHERE token = ?", (token,))
+
+    def limpar_expirados(self, forcar=False):
+        """Apaga rascunhos vencidos e os blobs que ficaram sem nenhuma referência"""
+        with self._lock:
+            if not forcar and time.time() - self._ultima_limpeza < INTERVALO_LIMPEZA_S:
+                return
+            self._ultima_limpeza = time.time()
+        limite = time.time() - self.validade_s
+        with self._conectar() as conexao:
+            conexao.execute(
+                "DELETE FROM fotos WHERE token IN (SELECT token FROM rascunhos WHERE atualizado_em < ?)", (limite,)
+            )
+            conexao.execute("DELETE FROM rascunhos WHERE atualizado_em < ?", (limite,))
+            sem_referencia = [linha[0] for linha in conexao.execute("SELECT hash FROM blobs WHERE referencias <= 0")]
+            conexao.executemany("DELETE FROM blobs WHERE hash = ? AND referencias <= 0",
+                                [(digest,) for digest in sem_referencia])
+            # Os arquivos saem antes do commit: enquanto a transação não termina, nenhum salvar_fotos
+            # consegue referenciar o blob, e o que vier depois não acha a linha e regrava o arquivo
+            for digest in sem_referencia:
+                try:
+                    os.remove(self._caminho_blob(digest))
+                except FileNotFoundError:
+                    pass
+
+    def estatisticas(self):
+        """Bytes guardados em disco e bytes poupados por guardar cada foto uma vez só"""
+        with self._conectar() as conexao:
+            guardados, referenciados = conexao.execute(
+                "SELECT COALESCE(SUM(tamanho), 0), COALESCE(SUM(tamanho * referencias), 0) FROM blobs "
+                "WHERE referencias > 0"
+            ).fetchone()
+        return {'bytes_guardados': guardados, 'bytes_poupados': referenciados - guardados}
+
+
+# Armazém compartilhado pelo processo
+armazem_rascunhos = ArmazemRascunhos(PASTA_RASCUNHOS_PADRAO, VALIDADE_RASCUNHO_S)
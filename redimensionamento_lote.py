@@ -0,0 +1,80 @@
+"""Redução em lote de fotos do mesmo tamanho com NumPy.
+
+As fotos de um relatório costumam vir do mesmo celular e ter a mesma resolução.
+Em vez de redimensionar uma a uma, elas são empilhadas num único array
+(N, altura, largura, canais) e reduzidas juntas por média de área: primeiro uma
+média em caixa pelo fator inteiro (soma de blocos k x k, barata), depois o resto
+da escala por duas multiplicações de matriz (linhas e colunas), seguida de um
+reforço leve de nitidez para compensar a suavização da média.
+"""
+import functools
+
+import numpy as np
+
+# Fotos por bloco de cálculo: limita a memória do array em float32
+TAMANHO_BLOCO = 16
+NITIDEZ_PADRAO = 0.5
+
+
+@functools.lru_cache(maxsize=32)
+def _matriz_area(origem, destino):
+    """Matriz (destino x origem) com o peso de cada pixel de origem em cada pixel de destino.
+
+    Cada pixel de destino cobre `origem / destino` pixels de origem; os das bordas entram
+    com a fração que fica dentro da janela.
+    """
+    escala = origem / destino
+    inicio = np.arange(destino, dtype=np.float64) * escala
+    fim = inicio + escala
+    posicoes = np.arange(origem, dtype=np.float64)
+    cobertura = np.minimum(fim[:, None], posicoes[None, :] + 1) - np.maximum(inicio[:, None], posicoes[None, :])
+    cobertura = np.clip(cobertura, 0, None)
+    return (cobertura / escala).astype(np.float32)
+
+
+def _realcar(lote, intensidade):
+    """Máscara de nitidez 3x3 (original + intensidade * (original - média dos vizinhos))"""
+    borda = np.pad(lote, ((0, 0), (1, 1), (1, 1), (0, 0)), mode="edge")
+    altura, largura = lote.shape[1:3]
+    # Média 3x3 separável: soma das 3 linhas, depois das 3 colunas
+    linhas = borda[:, :altura] + borda[:, 1:altura + 1] + borda[:, 2:altura + 2]
+    vizinhos = (linhas[:, :, :largura] + linhas[:, :, 1:largura + 1] + linhas[:, :, 2:largura + 2]) / 9
+    return lote + intensidade * (lote - vizinhos)
+
+
+def _media_caixa(bloco, fator_y, fator_x):
+    """Média de blocos fator_y x fator_x (recorta ao centro as sobras da divisão)"""
+    quantidade, altura, largura, canais = bloco.shape
+    nova_altura, nova_largura = altura // fator_y, largura // fator_x
+    topo, esquerda = (altura - nova_altura * fator_y) // 2, (largura - nova_largura * fator_x) // 2
+    bloco = bloco[:, topo:topo + nova_altura * fator_y, esquerda:esquerda + nova_largura * fator_x]
+    # Somas inteiras: uint16 comporta até 257 linhas de 255
+    soma = bloco.reshape(quantidade, nova_altura, fator_y, nova_largura * fator_x, canais).sum(axis=2, dtype=np.uint16)
+    soma = soma.reshape(quantidade, nova_altura, nova_largura, fator_x, canais).sum(axis=3, dtype=np.uint32)
+    return soma.astype(np.float32) / (fator_y * fator_x)
+
+
+def reduzir_area_lote(imagens, largura_px, altura_px, nitidez=NITIDEZ_PADRAO):
+    """Reduz um array uint8 (N, altura, largura, canais) para (N, altura_px, largura_px, canais)"""
+    quantidade, altura, largura, canais = imagens.shape
+    fator_y, fator_x = max(1, min(257, altura // altura_px)), max(1, min(257, largura // largura_px))
+    altura, largura = altura // fator_y, largura // fator_x
+    linhas = _matriz_area(altura, altura_px)
+    colunas = _matriz_area(largura, largura_px).T
+    saida = np.empty((quantidade, altura_px, largura_px, canais), dtype=np.uint8)
+    for inicio in range(0, quantidade, TAMANHO_BLOCO):
+        bloco = imagens[inicio:inicio + TAMANHO_BLOCO]
+        if fator_y > 1 or fator_x > 1:
+            bloco = _media_caixa(bloco, fator_y, fator_x)
+        else:
+            bloco = bloco.astype(np.float32)
+        # Linhas: (altura_px, altura) @ (n, altura, largura * canais)
+        bloco = linhas @ bloco.reshape(len(bloco), altura, largura * canais)
+        # Colunas: uma matriz 2D (n * altura_px * canais, largura) @ (largura, largura_px)
+        bloco = np.ascontiguousarray(bloco.reshape(len(bloco), altura_px, largura, canais).transpose(0, 1, 3, 2))
+        bloco = (bloco.reshape(-1, largura) @ colunas).reshape(len(bloco), altura_px, canais, largura_px)
+        bloco = bloco.transpose(0, 1, 3, 2)
+        if nitidez:
+            bloco = _realcar(bloco, nitidez)
+        saida[inicio:inicio + len(bloco)] = np.clip(bloco + 0.5, 0, 255).astype(np.uint8)
+    return saida
@@ -0,0 +1,123 @@
+import io
+import os
+
+from docx_streaming import escrever_relatorio_streaming
+from layout import layout_padrao
+from metricas import contar_bytes, medir
+from pdf_relatorio import escrever_relatorio_pdf
+from processamento_imagens import PERFIL_PLACA_PADRAO, reduzir_imagens_em_paralelo
+
+MIME_DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+MIME_PDF = "application/pdf"
+# Formatos de saída e o tipo MIME de cada um
+FORMATOS = {"docx": MIME_DOCX, "pdf": MIME_PDF}
+# A partir desta quantidade de fotos, as fotos do .docx são reduzidas em lotes à medida que são gravadas,
+# em vez de todas antes, para limitar o pico de memória
+LIMITE_FOTOS_REDUCAO_EM_LOTES = int(os.environ.get("RELATORIO_REDUCAO_EM_LOTES_FOTOS", "100"))
+
+
+def nome_arquivo_relatorio(site_id, data_execucao, formato="docx"):
+    """Nome padrão do arquivo do relatório"""
+    return f"RLT. ZELADORIA - {site_id} - {data_execucao.strftime('%Y-%m-%d')}.{formato}"
+
+
+def nome_unico(nome, usados):
+    """`nome`, ou `nome (2)`, `nome (3)`... se já estiver em `usados` (dois sites com o mesmo ID e data).
+    O nome escolhido entra em `usados`"""
+    base, extensao = os.path.splitext(nome)
+    candidato, numero = nome, 2
+    while candidato in usados:
+        candidato, numero = f"{base} ({numero}){extensao}", numero + 1
+    usados.add(candidato)
+    return candidato
+
+
+def reduzir_blocos(fotos_antes=None, fotos_depois=None, foto_placa=None, workers=None, progresso=None, perfil=None,
+                   perfil_placa=None, layout=None):
+    """Reduz as fotos uma única vez e retorna os blocos do relatório: [(título, fotos, fotos reduzidas)].
+
+    Os blocos servem tanto para o .docx quanto para o PDF, então gerar os dois formatos
+    não decodifica nem redimensiona nenhuma foto duas vezes.
+    """
+    layout = layout or layout_padrao
+    # Processar as fotos de ANTES e DEPOIS ao mesmo tempo; a placa pode ter um perfil próprio
+    lista_antes = list(fotos_antes or [])
+    lista_depois = list(fotos_depois or [])
+    lista_placa = [foto_placa] if foto_placa else []
+    largura_cm, altura_cm = layout.moldura_cm
+    reduzidas = reduzir_imagens_em_paralelo(lista_antes + lista_depois, largura_cm, altura_cm, workers=workers,
+                                            progresso=progresso, perfil=perfil, encaixe=True)
+    reduzidas_placa = reduzir_imagens_em_paralelo(lista_placa, largura_cm, altura_cm, workers=workers,
+                                                  progresso=progresso, perfil=perfil_placa or PERFIL_PLACA_PADRAO,
+                                                  encaixe=True)
+    blocos = [
+        ("FOTOS - ANTES", lista_antes, reduzidas[:len(lista_antes)]),
+        ("FOTOS - DEPOIS", lista_depois, reduzidas[len(lista_antes):]),
+        ("PLACA DE IDENTIFICAÇÃO", lista_placa, reduzidas_placa),
+    ]
+    return [bloco for bloco in blocos if bloco[1]]
+
+
+def escrever_relatorio(destino, site_id, data_execucao, localizacao, fotos_antes=None, fotos_depois=None,
+                       foto_placa=None, workers=None, reduzir_em_lotes=None, progresso=None, perfil=None,
+                       perfil_placa=None, layout=None, formato="docx", blocos=None):
+    """Grava o relatório em `destino` (caminho ou arquivo aberto) no `formato` pedido ("docx" ou "pdf").
+
+    O .docx sai sempre do modelo (ver docx_streaming). Com `reduzir_em_lotes=True` as fotos são reduzidas em
+    lotes à medida que são gravadas; com `False`, todas antes; com `None`, pela quantidade de fotos
+    (RELATORIO_REDUCAO_EM_LOTES_FOTOS).
+    `progresso(1)` é chamado a cada foto processada. `blocos` (ver reduzir_blocos) evita reduzir as fotos de novo.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconhecido: {formato}")
+    if formato == "pdf":
+        if blocos is None:
+            blocos = reduzir_blocos(fotos_antes, fotos_depois, foto_placa, workers, progresso, perfil, perfil_placa,
+                                    layout)
+        with medir("montagem_pdf"):
+            escrever_relatorio_pdf(destino, site_id, data_execucao, localizacao, blocos, layout)
+        return
+    if reduzir_em_lotes is None:
+        total_fotos = len(fotos_antes or []) + len(fotos_depois or []) + (1 if foto_placa else 0)
+        reduzir_em_lotes = total_fotos >= LIMITE_FOTOS_REDUCAO_EM_LOTES
+    if blocos is None and not reduzir_em_lotes:
+        # Todas as fotos reduzidas de uma vez (mais paralelismo); em lotes, à medida que são gravadas
+        blocos = reduzir_blocos(fotos_antes, fotos_depois, foto_placa, workers, progresso, perfil, perfil_placa,
+                                layout)
+    # O modelo preparado (modelo_docx) só recebe os campos e as fotos de cada relatório
+    with medir("montagem_documento"):
+        escrever_relatorio_streaming(destino, site_id, data_execucao, localizacao, fotos_antes, fotos_depois,
+                                     foto_placa, workers, progresso, perfil, perfil_placa, layout, blocos)
+
+
+def escrever_relatorios(destinos, site_id, data_execucao, localizacao, fotos_antes=None, fotos_depois=None,
+                        foto_placa=None, workers=None, reduzir_em_lotes=None, progresso=None, perfil=None,
+                        perfil_placa=None, layout=None):
+    """Grava o relatório em vários formatos ({formato: destino}) reduzindo cada foto uma única vez"""
+    blocos = None
+    if len(destinos) > 1:
+        blocos = reduzir_blocos(fotos_antes, fotos_depois, foto_placa, workers, progresso, perfil, perfil_placa,
+                                layout)
+    for formato, destino in destinos.items():
+        escrever_relatorio(destino, site_id, data_execucao, localizacao, fotos_antes, fotos_depois, foto_placa,
+                           workers, reduzir_em_lotes, progresso, perfil, perfil_placa, layout, formato, blocos)
+
+
+def gerar_relatorio(site_id, data_execucao, localizacao, fotos_antes=None, fotos_depois=None, foto_placa=None,
+                    workers=None, reduzir_em_lotes=None, progresso=None, perfil=None, perfil_placa=None,
+                    layout=None, formato="docx"):
+    """Gera o relatório completo e retorna os bytes do arquivo (.docx por padrão)"""
+    return gerar_relatorios(site_id, data_execucao, localizacao, fotos_antes, fotos_depois, foto_placa, workers,
+                            reduzir_em_lotes, progresso, perfil, perfil_placa, layout, formatos=(formato,))[formato]
+
+
+def gerar_relatorios(site_id, data_execucao, localizacao, fotos_antes=None, fotos_depois=None, foto_placa=None,
+                     workers=None, reduzir_em_lotes=None, progresso=None, perfil=None, perfil_placa=None,
+                     layout=None, formatos=("docx", "pdf")):
+    """Gera o relatório em cada um dos `formatos` e retorna {formato: bytes}"""
+    buffers = {formato: io.BytesIO() for formato in formatos}
+    escrever_relatorios(buffers, site_id, data_execucao, localizacao, fotos_antes, fotos_depois, foto_placa,
+                        workers, reduzir_em_lotes, progresso, perfil, perfil_placa, layout)
+    for formato, buffer in buffers.items():
+        contar_bytes(formato, buffer.tell())
+    return {formato: buffer.getvalue() for formato, buffer in buffers.items()}
@@ -0,0 +1,171 @@
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from metricas import coletar_relatorio
+from pool_processos import sessao as sessao_pool
+
+# Quantas gerações rodam ao mesmo tempo e por quanto tempo o resultado fica disponível para download
+WORKERS_TAREFAS_PADRAO = int(os.environ.get("RELATORIO_TAREFAS_WORKERS", "2"))
+VALIDADE_TAREFA_S = int(os.environ.get("RELATORIO_TAREFAS_VALIDADE_S", "3600"))
+
+AGUARDANDO = "aguardando"
+EXECUTANDO = "executando"
+CONCLUIDA = "concluida"
+ERRO = "erro"
+
+
+def total_fotos_site(fotos_antes=None, fotos_depois=None, foto_placa=None):
+    """Fotos que entram no relatório de um site"""
+    return len(fotos_antes or []) + len(fotos_depois or []) + (1 if foto_placa else 0)
+
+
+class Tarefa:
+    """Estado de uma geração de relatório em segundo plano"""
+
+    def __init__(self, total_fotos):
+        self.id = uuid.uuid4().hex
+        self.estado = AGUARDANDO
+        self.total_fotos = total_fotos
+        self.fotos_processadas = 0
+        # (nome do arquivo, tipo MIME, bytes) de cada formato gerado em memória
+        self.arquivos = []
+        # Resultados grandes (.zip de vários sites) ficam em arquivo temporário em vez de na memória
+        self.caminho_resultado = None
+        self.nome_arquivo = None
+        self.mime = None
+        self.falhas = []
+        self.erro = None
+        self.detalhamento = None
+        self.criada_em = time.time()
+        self.concluida_em = None
+
+    @property
+    def progresso(self):
+        if self.estado == CONCLUIDA:
+            return 1.0
+        if not self.total_fotos:
+            return 0.0
+        # Reserva os últimos 10% para a montagem e gravação dos arquivos
+        return 0.9 * self.fotos_processadas / self.total_fotos
+
+    @property
+    def finalizada(self):
+        return self.estado in (CONCLUIDA, ERRO)
+
+    @property
+    def tamanho_resultado(self):
+        if self.caminho_resultado:
+            return os.path.getsize(self.caminho_resultado)
+        return sum(len(dados) for _, _, dados in self.arquivos)
+
+    def ler_resultado(self):
+        """Bytes do resultado gravado em arquivo (.zip)"""
+        with open(self.caminho_resultado, "rb") as arquivo:
+            return arquivo.read()
+
+    def descartar(self):
+        if self.caminho_resultado:
+            try:
+                os.remove(self.caminho_resultado)
+            except FileNotFoundError:
+                pass
+
+
+class GerenciadorTarefas:
+    """Fila de gerações de relatório executadas em threads, consultáveis pelo ID da tarefa"""
+
+    def __init__(self, workers, validade_s):
+        self.validade_s = validade_s
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="relatorio")
+        self._tarefas = {}
+        self._lock = threading.Lock()
+
+    def enviar(self, site_id, data_execucao, localizacao, fotos_antes=None, fotos_depois=None, foto_placa=None,
+               sessao=None, formatos=("docx",)):
+        """Enfileira a geração do relatório em cada um dos `formatos` ("docx", "pdf") e retorna o ID da tarefa.
+
+        `sessao` identifica a fila do pool compartilhado (por padrão, a própria tarefa).
+        """
+        fotos_antes = list(fotos_antes or [])
+        fotos_depois = list(fotos_depois or [])
+        tarefa = Tarefa(total_fotos_site(fotos_antes, fotos_depois, foto_placa))
+        return self._enfileirar(tarefa, sessao, partial(self._gerar_relatorio, site_id, data_execucao, localizacao,
+                                                        fotos_antes, fotos_depois, foto_placa, tuple(formatos)))
+
+    def enviar_lote(self, sites, sessao=None, formatos=("docx",)):
+        """Enfileira a geração de um .zip com o relatório de cada site e retorna o ID da tarefa.
+
+        `sites` são dicts com site_id, data_execucao, localizacao, fotos_antes, fotos_depois e foto_placa.
+        """
+        sites = [dict(site) for site in sites]
+        total_fotos = sum(total_fotos_site(site.get('fotos_antes'), site.get('fotos_depois'), site.get('foto_placa'))
+                          for site in sites)
+        return self._enfileirar(Tarefa(total_fotos), sessao, partial(self._gerar_zip, sites, tuple(formatos)))
+
+    def _enfileirar(self, tarefa, sessao, gerar):
+        self._limpar_expiradas()
+        with self._lock:
+            self._tarefas[tarefa.id] = tarefa
+        self._executor.submit(self._executar, tarefa, sessao or tarefa.id, gerar)
+        return tarefa.id
+
+    def obter(self, id_tarefa):
+        with self._lock:
+            return self._tarefas.get(id_tarefa)
+
+    def _executar(self, tarefa, sessao, gerar):
+        tarefa.estado = EXECUTANDO
+
+        def avancar(quantidade):
+            tarefa.fotos_processadas += quantidade
+
+        try:
+            with coletar_relatorio() as coletor, sessao_pool(sessao):
+                tarefa.detalhamento = coletor
+                gerar(tarefa, avancar)
+            tarefa.estado = CONCLUIDA
+        except Exception as e:
+            tarefa.erro = str(e)
+            tarefa.estado = ERRO
+        finally:
+            tarefa.concluida_em = time.time()
+
+    @staticmethod
+    def _gerar_relatorio(site_id, data_execucao, localizacao, fotos_antes, fotos_depois, foto_placa, formatos, tarefa,
+                         avancar):
+        # O relatório (e PIL) só é carregado quando o primeiro relatório é gerado
+        from relatorio import FORMATOS, gerar_relatorios, nome_arquivo_relatorio
+
+        # Os formatos saem das mesmas fotos reduzidas: cada foto é processada uma vez só
+        gerados = gerar_relatorios(site_id, data_execucao, localizacao, fotos_antes, fotos_depois, foto_placa,
+                                   progresso=avancar, formatos=formatos)
+        tarefa.arquivos = [(nome_arquivo_relatorio(site_id, data_execucao, formato), FORMATOS[formato], dados)
+                           for formato, dados in gerados.items()]
+
+    @staticmethod
+    def _gerar_zip(sites, formatos, tarefa, avancar):
+        from exportacao_zip import MIME_ZIP, escrever_zip, nome_arquivo_zip
+
+        descritor, tarefa.caminho_resultado = tempfile.mkstemp(prefix="relatorios-", suffix=".zip")
+        with os.fdopen(descritor, "wb") as arquivo:
+            gravados, tarefa.falhas = escrever_zip(arquivo, sites, progresso=avancar, formatos=formatos)
+        if not gravados:
+            raise RuntimeError("; ".join(f"{site_id}: {erro}" for site_id, erro in tarefa.falhas))
+        # O nome conta só os sites que entraram no .zip
+        tarefa.nome_arquivo = nome_arquivo_zip(gravados)
+        tarefa.mime = MIME_ZIP
+
+    def _limpar_expiradas(self):
+        limite = time.time() - self.validade_s
+        with self._lock:
+            for id_tarefa in [i for i, t in self._tarefas.items() if t.concluida_em and t.concluida_em < limite]:
+                self._tarefas.pop(id_tarefa).descartar()
+
+
+# Gerenciador compartilhado pelo processo: uma sessão que reconecta encontra a tarefa pelo ID
+gerenciador_padrao = GerenciadorTarefas(WORKERS_TAREFAS_PADRAO, VALIDADE_TAREFA_S)
@@ -0,0 +1,189 @@
+"""Envio de fotos em partes, que continua de onde parou depois de uma reconexão.
+
+O componente do navegador (componentes/upload_resumivel) manda uma foto por vez,
+em partes de tamanho fixo, opcionalmente já compactada no próprio celular. Cada
+parte só é enviada depois que o servidor confirma a anterior. As partes recebidas
+ficam num armazém do processo, fora do session state, então uma sessão nova
+(após "reconnecting") retoma a partir da última parte confirmada e não reenvia
+as fotos que já chegaram inteiras.
+
+Uma foto completa é entregue uma única vez à sessão, que a compacta e guarda (e o
+rascunho a persiste); o armazém libera os bytes e fica só com o total recebido,
+para o navegador continuar vendo a foto como enviada.
+
+O ID de cada envio vem do navegador, então o armazém guarda os envios por
+(dono, ID): o dono é o token do rascunho, que sobrevive à reconexão. Uma sessão
+que mande o ID de um envio de outra não acrescenta partes a ele nem o recebe.
+
+Configuração por variável de ambiente:
+    RELATORIO_UPLOAD_MAX_MB       tamanho máximo de cada foto (padrão: o server.maxUploadSize do Streamlit)
+    RELATORIO_UPLOAD_ARMAZEM_MB   total de bytes ainda não entregues no armazém, somando todas as sessões
+                                  (padrão 1024); acima disso as partes novas esperam espaço
+"""
+import base64
+import os
+import secrets
+import threading
+import time
+
+import streamlit.components.v1 as components
+from streamlit import config
+
+TAMANHO_PARTE_PADRAO = 256 * 1024
+VALIDADE_UPLOAD_S = int(os.environ.get("RELATORIO_UPLOAD_VALIDADE_S", str(24 * 3600)))
+MAX_MB_UPLOAD = int(os.environ.get("RELATORIO_UPLOAD_MAX_MB", "0")) or config.get_option("server.maxUploadSize")
+MAX_MB_ARMAZEM = int(os.environ.get("RELATORIO_UPLOAD_ARMAZEM_MB", "1024"))
+
+_componente = components.declare_component(
+    "upload_resumivel",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "componentes", "upload_resumivel"),
+)
+
+
+class ArmazemUploads:
+    """Guarda as partes recebidas de cada foto até ela chegar inteira e ser entregue à sessão.
+
+    Todas as operações recebem o `dono` do envio; o ID sozinho não dá acesso a nada.
+    """
+
+    def __init__(self, validade_s, max_bytes_upload, max_bytes_total):
+        self.validade_s = validade_s
+        self.max_bytes_upload = max_bytes_upload
+        self.max_bytes_total = max_bytes_total
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def _reservado(self):
+        # Espaço prometido às fotos ainda não entregues (o tamanho declarado, não só o já recebido)
+        return sum(u['size'] for u in self._uploads.values() if u['data'] is not None)
+
+    def receber_parte(self, dono, id_upload, nome, tipo, tamanho, offset, dados):
+        """Acrescenta a parte se ela for a próxima esperada. Retorna o total recebido até agora"""
+        chave = (dono, id_upload)
+        with self._lock:
+            upload = self._uploads.get(chave)
+            if upload is None:
+                if tamanho > self.max_bytes_upload:
+                    # Recusa definitiva: o navegador mostra o motivo e não tenta de novo
+                    motivo = f"maior que {self.max_bytes_upload // (1024 * 1024)} MB"
+                    self._uploads[chave] = {
+                        'name': nome, 'size': tamanho, 'data': None, 'recebido': 0, 'recusa': motivo,
+                        'atualizado_em': time.time(),
+                    }
+                    return 0
+                if self._reservado() + tamanho > self.max_bytes_total:
+                    # Armazém cheio: a parte é ignorada e o navegador reenvia depois
+                    return 0
+                upload = self._uploads[chave] = {
+                    'name': nome,
+                    'type': tipo,
+                    'size': tamanho,
+                    'data': bytearray(),
+                    'recebido': 0,
+                    'recusa': None,
+                    'atualizado_em': time.time(),
+                }
+            # Partes repetidas (reenvio após reconexão), fora de ordem ou além do tamanho declarado são ignoradas
+            if upload['data'] is not None and offset == upload['recebido'] and offset + len(dados) <= tamanho:
+                upload['data'] += dados
+                upload['recebido'] = len(upload['data'])
+                upload['atualizado_em'] = time.time()
+            return upload['recebido']
+
+    def recebido(self, dono, id_upload):
+        with self._lock:
+            upload = self._uploads.get((dono, id_upload))
+            return upload['recebido'] if upload else 0
+
+    def recusa(self, dono, id_upload):
+        """Motivo da recusa da foto, ou None"""
+        with self._lock:
+            upload = self._uploads.get((dono, id_upload))
+            return upload['recusa'] if upload else None
+
+    def entregar(self, dono, id_upload):
+        """Retorna a foto completa (dict no formato do session state) uma única vez, ou None.
+
+        Depois da entrega os bytes saem do armazém; fica só o total recebido, para o navegador.
+        """
+        with self._lock:
+            upload = self._uploads.get((dono, id_upload))
+            if upload is None or upload['data'] is None or upload['recebido'] < upload['size']:
+                return None
+            dados, upload['data'] = bytes(upload['data']), None
+            return {
+                'name': upload['name'],
+                'size': upload['size'],
+                'type': upload['type'],
+                'data': dados,
+            }
+
+    def remover(self, dono, id_upload):
+        with self._lock:
+            self._uploads.pop((dono, id_upload), None)
+
+    def limpar_expirados(self):
+        limite = time.time() - self.validade_s
+        with self._lock:
+            for chave in [c for c, u in self._uploads.items() if u['atualizado_em'] < limite]:
+                del self._uploads[chave]
+
+
+# Armazém compartilhado pelo processo, para sobreviver à troca de sessão numa reconexão
+armazem_padrao = ArmazemUploads(VALIDADE_UPLOAD_S, MAX_MB_UPLOAD * 1024 * 1024, MAX_MB_ARMAZEM * 1024 * 1024)
+
+
+def dono_uploads():
+    """Dono dos envios desta sessão: o token do rascunho (o mesmo depois de uma reconexão)
+    ou, sem rascunho, um token aleatório da sessão"""
+    import streamlit as st
+
+    if st.session_state.get('rascunho_token'):
+        return st.session_state.rascunho_token
+    return st.session_state.setdefault('dono_uploads', secrets.token_urlsafe(16))
+
+
+def upload_resumivel(rotulo, chave, multiplas=True, compactar_lado_px=2048, armazem=None):
+    """Mostra o componente de envio resumível e retorna as fotos que acabaram de chegar por completo.
+
+    Retorna um dict {id_upload: foto}, no mesmo formato usado pelo session state. Cada foto só é
+    retornada uma vez: quem chama deve guardá-la.
+    """
+    import streamlit as st
+
+    armazem = armazem or armazem_padrao
+    armazem.limpar_expirados()
+    dono = dono_uploads()
+
+    # O valor enviado pelo navegador fica no session state antes mesmo de o componente ser desenhado,
+    # o que permite registrar a parte e já devolver a confirmação nesta mesma execução
+    mensagem = st.session_state.get(chave)
+    if mensagem and mensagem.get('dados') is not None:
+        armazem.receber_parte(
+            dono, mensagem['id'], mensagem['nome'], mensagem['tipo'], mensagem['tamanho'],
+            mensagem['offset'], base64.b64decode(mensagem['dados'])
+        )
+
+    ids_conhecidos = st.session_state.get(f"{chave}_ids", [])
+    if mensagem and mensagem.get('ids'):
+        ids_conhecidos = mensagem['ids']
+        st.session_state[f"{chave}_ids"] = ids_conhecidos
+
+    _componente(
+        rotulo=rotulo,
+        multiplas=multiplas,
+        compactar_lado_px=compactar_lado_px,
+        tamanho_parte=TAMANHO_PARTE_PADRAO,
+        confirmados={id_upload: armazem.recebido(dono, id_upload) for id_upload in ids_conhecidos},
+        recusados={id_upload: armazem.recusa(dono, id_upload) for id_upload in ids_conhecidos
+                   if armazem.recusa(dono, id_upload)},
+        key=chave,
+        default=None,
+    )
+
+    fotos = {}
+    for id_upload in ids_conhecidos:
+        foto = armazem.entregar(dono, id_upload)
+        if foto is not None:
+            fotos[id_upload] = foto
+    return fotos